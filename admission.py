@@ -0,0 +1,234 @@
+# admission.py
+
+"""
+Admission control for the answer pipeline.
+
+Responsibilities:
+- Hold finalized questions in a bounded queue instead of starting unlimited
+  embed + LLM jobs.
+- Serve users fairly: jobs are taken round-robin across users, and each user
+  may only have a few questions waiting at once.
+- Cap global concurrency with a fixed number of worker tasks.
+- Shed load explicitly: when the queue is full, submit() raises QueueFullError
+  with a retry-after hint instead of queueing more work.
+- Publish queue depth, in-flight jobs, wait time and rejections to `metrics`.
+- Cap concurrent batch requests (globally and per user) with BatchAdmission,
+  shedding the excess with the same QueueFullError / retry-after hint.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from metrics import metrics
+
+
+class QueueFullError(Exception):
+    """Raised when a job is rejected because the queue (or the user's share) is full."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class AnswerJob:
+    """A finalized question waiting to be answered."""
+    session_id: str
+    user_id: str
+    question: str
+    question_id: Optional[str] = None
+    corpus: Optional[str] = None
+    started_at: float = 0.0          # wall-clock time of the last fragment
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class AnswerQueue:
+    """
+    Bounded, per-user fair work queue with a global concurrency cap.
+
+    `handler` is awaited for every job by one of `max_concurrency` workers.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[AnswerJob], Awaitable[None]],
+        max_concurrency: int = 4,
+        max_queue_size: int = 64,
+        max_per_user: int = 2,
+    ) -> None:
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.max_per_user = max_per_user
+
+        self._user_jobs: Dict[str, Deque[AnswerJob]] = {}
+        self._ready_users: Deque[str] = deque()   # round-robin order
+        self._depth = 0
+        self._in_flight = 0
+        self._avg_service_seconds = 2.0            # EWMA, seeds the retry-after hint
+        self._available: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting (not yet started)."""
+        return self._depth
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently being answered."""
+        return self._in_flight
+
+    def is_full(self) -> bool:
+        return self._depth >= self.max_queue_size
+
+    def retry_after(self) -> int:
+        """Estimated seconds until there is room again (1..60)."""
+        backlog = (self._depth + 1) / max(1, self.max_concurrency)
+        return int(min(60, max(1, round(backlog * self._avg_service_seconds))))
+
+    def submit(self, job: AnswerJob) -> None:
+        """
+        Enqueue a job.
+
+        Raises QueueFullError when the global queue or the user's share is full.
+        """
+        pending = self._user_jobs.get(job.user_id)
+        if self.is_full():
+            metrics.increment("answer_queue_rejected")
+            raise QueueFullError("Answer queue is full.", self.retry_after())
+        if pending is not None and len(pending) >= self.max_per_user:
+            metrics.increment("answer_queue_rejected_per_user")
+            raise QueueFullError("Too many pending questions for this user.", self.retry_after())
+
+        if pending is None:
+            pending = deque()
+            self._user_jobs[job.user_id] = pending
+            self._ready_users.append(job.user_id)
+        pending.append(job)
+        self._depth += 1
+        self._publish_gauges()
+
+        if self._available is not None:
+            asyncio.ensure_future(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._available:
+            self._available.notify()
+
+    def _next_job(self) -> Optional[AnswerJob]:
+        """Take the next job round-robin across users."""
+        if not self._ready_users:
+            return None
+        user_id = self._ready_users.popleft()
+        pending = self._user_jobs[user_id]
+        job = pending.popleft()
+        if pending:
+            self._ready_users.append(user_id)
+        else:
+            del self._user_jobs[user_id]
+        self._depth -= 1
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._available:
+                await self._available.wait_for(lambda: bool(self._ready_users))
+                job = self._next_job()
+
+            metrics.observe("answer_queue_wait", time.perf_counter() - job.enqueued_at)
+            self._in_flight += 1
+            self._publish_gauges()
+            started = time.perf_counter()
+            try:
+                await self.handler(job)
+            except Exception as exc:  # noqa: BLE001
+                print(f"[ERROR] Answer job failed for {job.session_id}: {exc}")
+            finally:
+                elapsed = time.perf_counter() - started
+                self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * elapsed
+                self._in_flight -= 1
+                self._publish_gauges()
+
+    def _publish_gauges(self) -> None:
+        metrics.set_gauge("answer_queue_depth", self._depth)
+        metrics.set_gauge("answer_queue_in_flight", self._in_flight)
+
+    def start(self) -> None:
+        """Start the worker tasks (call from the running event loop)."""
+        if self._workers:
+            return
+        self._available = asyncio.Condition()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)
+        ]
+        self._publish_gauges()
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+class BatchAdmission:
+    """
+    Admission control for batch requests.
+
+    At most `max_batches` batches run at once, and each user may only run
+    `max_per_user` of them. Thread-safe: acquire() / release() are called from
+    threadpool workers; releasing the same ticket twice is a no-op.
+    """
+
+    def __init__(self, max_batches: int = 2, max_per_user: int = 1) -> None:
+        self.max_batches = max_batches
+        self.max_per_user = max_per_user
+        self._running: Dict[str, int] = {}
+        self._tickets: Dict[int, tuple] = {}       # ticket -> (user_id, started)
+        self._next_ticket = 0
+        self._in_flight = 0
+        self._avg_batch_seconds = 30.0             # EWMA, seeds the retry-after hint
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a batch slot frees up (1..60)."""
+        return int(min(60, max(1, round(self._avg_batch_seconds / 2))))
+
+    def acquire(self, user_id: str) -> int:
+        """
+        Take a batch slot for `user_id` and return a ticket for release().
+
+        Raises QueueFullError when all slots (or the user's share) are taken.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_batches:
+                metrics.increment("batch_rejected")
+                raise QueueFullError("Too many batch requests running.", self.retry_after())
+            if self._running.get(user_id, 0) >= self.max_per_user:
+                metrics.increment("batch_rejected_per_user")
+                raise QueueFullError("A batch request for this user is already running.", self.retry_after())
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            self._in_flight += 1
+            self._next_ticket += 1
+            self._tickets[self._next_ticket] = (user_id, time.perf_counter())
+            metrics.set_gauge("batch_in_flight", self._in_flight)
+            return self._next_ticket
+
+    def release(self, ticket: int) -> None:
+        """Give back the slot taken by acquire()."""
+        with self._lock:
+            if ticket not in self._tickets:
+                return
+            user_id, started = self._tickets.pop(ticket)
+            elapsed = time.perf_counter() - started
+            self._avg_batch_seconds = 0.8 * self._avg_batch_seconds + 0.2 * elapsed
+            self._running[user_id] -= 1
+            if not self._running[user_id]:
+                del self._running[user_id]
+            self._in_flight -= 1
+            metrics.set_gauge("batch_in_flight", self._in_flight)
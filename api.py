@@ -8,19 +8,111 @@ Handles:
 - Chatbot query endpoint that interacts with the RAG pipeline
 - Uses SessionManager for message accumulation (per user_id + chat_id)
 - Uses BackgroundTasks to wait (10s) and generate answers without blocking requests
+- Warms up the embedding model, vector store and LLM client on startup
+- Exposes latency / error metrics at /metrics
+- Admission control: finalized questions go through a bounded, per-user fair
+  queue with a global concurrency cap; overload is shed with "busy, retry after"
+- Batch endpoint that streams answers for many questions as JSONL
+- Requests may target a named corpus; rebuilt corpora are picked up without restart
+- Readiness probe at /ready: runs warm-up queries after startup and reports
+  ready once their p99 latency is within READY_P99_TARGET_MS
 """
 
+import json
 import time
 import asyncio
-from fastapi import FastAPI, BackgroundTasks
+from typing import List, Optional
+
+from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
+from admission import AnswerJob, AnswerQueue, BatchAdmission, QueueFullError
+from config import (
+    ANSWER_MAX_CONCURRENCY,
+    ANSWER_QUEUE_MAX_PER_USER,
+    ANSWER_QUEUE_MAX_SIZE,
+    BATCH_LLM_CONCURRENCY,
+    BATCH_MAX_CONCURRENT_REQUESTS,
+    BATCH_MAX_PER_USER,
+    BATCH_MAX_QUESTIONS,
+    READY_P99_TARGET_MS,
+    warm_up,
+)
+from batch_qa import answer_batch
+from corpus_registry import corpus_exists
 from rag_core import generate_answer
 from conversation_logger import log_interaction
+from metrics import metrics
 from session_manager import session_manager
+from snapshot import run_warm_up_queries
 
 app = FastAPI(title="Company Handbook Chatbot")
 
+
+@app.on_event("startup")
+def warm_up_resources() -> None:
+    """Load heavy resources once at startup so the first request is not slow."""
+    warm_up()
+
+
+@app.on_event("startup")
+async def start_answer_queue() -> None:
+    """Start the answer queue workers."""
+    answer_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_answer_queue() -> None:
+    """Stop the answer queue workers."""
+    await answer_queue.stop()
+
+
+# Readiness state, updated by the warm-up task below
+readiness = {"ready": False, "rounds": 0, "warm_up": None}
+# The event loop only keeps weak references to tasks
+_readiness_task: Optional[asyncio.Task] = None
+
+
+async def warm_up_until_ready() -> None:
+    """
+    Run rounds of warm-up queries (embed + retrieve, no LLM) until their p99
+    latency is within READY_P99_TARGET_MS, then mark the API as ready.
+    """
+    while not readiness["ready"]:
+        try:
+            summary = await run_in_threadpool(run_warm_up_queries)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[WARN] Warm-up queries failed: {exc}")
+            await asyncio.sleep(5)
+            continue
+
+        readiness["rounds"] += 1
+        readiness["warm_up"] = summary
+        readiness["ready"] = summary["p99_ms"] <= READY_P99_TARGET_MS
+        print(
+            f"[INFO] Warm-up round {readiness['rounds']}: p99 {summary['p99_ms']} ms "
+            f"(target {READY_P99_TARGET_MS} ms)"
+        )
+        if not readiness["ready"]:
+            await asyncio.sleep(1)
+
+
+@app.on_event("startup")
+async def start_readiness_probe() -> None:
+    """Start warming up in the background; /ready reports the progress."""
+    global _readiness_task
+    _readiness_task = asyncio.create_task(warm_up_until_ready())
+
+
+@app.on_event("shutdown")
+async def stop_readiness_probe() -> None:
+    """Cancel the warm-up task if the API shuts down before it is ready."""
+    if _readiness_task is not None and not _readiness_task.done():
+        _readiness_task.cancel()
+
 # ==== Request/Response models ====
 
 class ChatRequest(BaseModel):
@@ -29,15 +121,33 @@ class ChatRequest(BaseModel):
     - user_id: identifier of the user (employee id / email / etc.)
     - chat_id: identifier of a conversation belonging to that user
     - question: the fragment the user just sent
+    - corpus: optional corpus name (e.g. "hr"); defaults to the handbook
     """
     user_id: str
     chat_id: str
     question: str
+    corpus: Optional[str] = None
 
 class ChatResponse(BaseModel):
     """Response body containing the chatbot's answer or status message."""
     answer: str
 
+class BatchRequest(BaseModel):
+    """
+    Request body for batch question answering.
+    - questions: list of complete questions (no fragment merging)
+    - top_k: number of chunks retrieved per question
+    - corpus: optional corpus name; defaults to the handbook
+    - user_id: optional caller id, used for per-user batch limits
+    """
+    questions: List[str]
+    top_k: int = 10
+    corpus: Optional[str] = None
+    user_id: Optional[str] = None
+
+ERROR_MESSAGE = "(Sorry, something went wrong while generating the answer. Please try again.)"
+BUSY_MESSAGE = "(The assistant is busy right now. Please retry in {retry_after} seconds.)"
+
 # ==== Helper: build session_key from user_id + chat_id ====
 
 def make_session_key(user_id: str, chat_id: str) -> str:
@@ -49,12 +159,18 @@ def make_session_key(user_id: str, chat_id: str) -> str:
 
 # ==== Background task ====
 
-async def process_session_after_timeout(session_id: str, started_at: float) -> None:
+async def process_session_after_timeout(
+    session_id: str,
+    user_id: str,
+    started_at: float,
+    corpus: Optional[str] = None,
+) -> None:
     """
     Background task:
     - Wait compose_window seconds.
     - Check if there has been new input after 'started_at'.
-    - If not, treat the buffer as a final question, call RAG, and store the answer.
+    - If not, treat the buffer as a final question and submit it to the answer queue.
+    - If the queue is full, store a "busy, retry after" message as the answer.
     """
     await asyncio.sleep(session_manager.compose_window)
 
@@ -72,17 +188,54 @@ async def process_session_after_timeout(session_id: str, started_at: float) -> N
     if not final_question:
         return
 
-    # Call RAG pipeline
+    job = AnswerJob(
+        session_id=session_id,
+        user_id=user_id,
+        question=final_question,
+        question_id=question_id,
+        corpus=corpus,
+        started_at=started_at,
+    )
+    try:
+        answer_queue.submit(job)
+    except QueueFullError as exc:
+        session_manager.set_answer(session_id, BUSY_MESSAGE.format(retry_after=exc.retry_after))
+
+
+async def answer_question(job: AnswerJob) -> None:
+    """
+    Answer-queue handler: call RAG, log the Q&A, update history and store the answer.
+    """
+    state = session_manager.get_state(job.session_id)
+    if state is None:
+        return
+
+    # Call RAG pipeline in a worker thread so the event loop keeps serving requests
+    # (and identical concurrent prompts can be coalesced by the LLM provider)
     history = state.history if hasattr(state, "history") else None
-    result = generate_answer(final_question, history=history)
+    pipeline_started = time.perf_counter()
+    try:
+        result = await run_in_threadpool(
+            generate_answer, job.question, history=history, corpus=job.corpus
+        )
+    except Exception as exc:  # noqa: BLE001
+        print(f"[ERROR] Answer pipeline failed for {job.session_id}: {exc}")
+        metrics.increment("answer_errors")
+        session_manager.set_answer(job.session_id, ERROR_MESSAGE)
+        return
+    metrics.observe("answer_pipeline", time.perf_counter() - pipeline_started)
+    if result.get("faq_id"):
+        metrics.increment("faq_hits")
+    if result.get("gated"):
+        metrics.increment("retrieval_gate_rejections")
     answer = result["answer"]
 
     # Log Q&A
-    log_interaction(final_question, answer, question_id=question_id)
+    log_interaction(job.question, answer, question_id=job.question_id, corpus=job.corpus)
 
     # History update: added 1 new question and answer
     state.history.append({
-        "user": final_question,
+        "user": job.question,
         "assistant": answer,
     })
     # Keep up to 5 recent turns (can increase to 10)
@@ -90,7 +243,22 @@ async def process_session_after_timeout(session_id: str, started_at: float) -> N
         state.history = state.history[-5:]
 
     # Store answer for later retrieval
-    session_manager.set_answer(session_id, answer)
+    session_manager.set_answer(job.session_id, answer)
+    metrics.increment("answers")
+    metrics.observe("question_end_to_end", time.time() - job.started_at)
+
+
+answer_queue = AnswerQueue(
+    answer_question,
+    max_concurrency=ANSWER_MAX_CONCURRENCY,
+    max_queue_size=ANSWER_QUEUE_MAX_SIZE,
+    max_per_user=ANSWER_QUEUE_MAX_PER_USER,
+)
+
+batch_admission = BatchAdmission(
+    max_batches=BATCH_MAX_CONCURRENT_REQUESTS,
+    max_per_user=BATCH_MAX_PER_USER,
+)
 
 # ==== Endpoints ====
 
@@ -106,7 +274,20 @@ async def chatbot_query(req: ChatRequest, background_tasks: BackgroundTasks) ->
         - wait compose_window seconds,
         - if no new fragment arrives → treat it as a final question → call RAG → store answer.
     - Immediately return a status message WITHOUT blocking the client.
+    - If the answer queue is full, reject with 503 and a Retry-After header.
     """
+    if not corpus_exists(req.corpus):
+        raise HTTPException(status_code=404, detail=f"Unknown corpus '{req.corpus}'.")
+
+    if answer_queue.is_full():
+        metrics.increment("answer_queue_rejected")
+        retry_after = answer_queue.retry_after()
+        return JSONResponse(
+            status_code=503,
+            content={"answer": BUSY_MESSAGE.format(retry_after=retry_after)},
+            headers={"Retry-After": str(retry_after)},
+        )
+
     session_key = make_session_key(req.user_id, req.chat_id)
 
     # 1) Add fragment to buffer
@@ -114,7 +295,9 @@ async def chatbot_query(req: ChatRequest, background_tasks: BackgroundTasks) ->
 
     # 2) Schedule background task with the current timestamp
     started_at = time.time()
-    background_tasks.add_task(process_session_after_timeout, session_key, started_at)
+    background_tasks.add_task(
+        process_session_after_timeout, session_key, req.user_id, started_at, req.corpus
+    )
 
     # 3) Return immediately (do not wait for LLM)
     return ChatResponse(
@@ -140,3 +323,85 @@ async def get_chatbot_result(user_id: str, chat_id: str) -> ChatResponse:
     return ChatResponse(answer=ans)
 
 
+@app.post("/batch_query")
+def batch_query(req: BatchRequest) -> StreamingResponse:
+    """
+    Answer many questions at once and stream the results as JSONL, in input order.
+
+    Questions are embedded in one batched call and retrieved together; LLM
+    calls run concurrently, at most BATCH_LLM_CONCURRENCY across all batches.
+    At most BATCH_MAX_CONCURRENT_REQUESTS batches (BATCH_MAX_PER_USER per
+    user) run at once; more are rejected with 503 and a Retry-After header.
+    Batch jobs are not written to the chat log.
+    """
+    if not corpus_exists(req.corpus):
+        raise HTTPException(status_code=404, detail=f"Unknown corpus '{req.corpus}'.")
+    if len(req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many questions: {len(req.questions)} > {BATCH_MAX_QUESTIONS}.",
+        )
+
+    user_id = req.user_id or "anonymous"
+    try:
+        ticket = batch_admission.acquire(user_id)
+    except QueueFullError as exc:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    def stream_results():
+        try:
+            for result in answer_batch(
+                req.questions, top_k=req.top_k, max_concurrency=BATCH_LLM_CONCURRENCY, corpus=req.corpus
+            ):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            batch_admission.release(ticket)
+
+    # The background task also frees the slot if the stream never started
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(batch_admission.release, ticket),
+    )
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 {"status": "ready", ...} once the warm-up queries
+    meet the p99 latency target, otherwise 503 {"status": "warming_up", ...}.
+    """
+    body = {
+        "status": "ready" if readiness["ready"] else "warming_up",
+        "rounds": readiness["rounds"],
+        "target_p99_ms": READY_P99_TARGET_MS,
+        "warm_up": readiness["warm_up"],
+    }
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/metrics")
+async def get_metrics() -> dict:
+    """
+    Return in-process metrics: counters, gauges and latency percentiles.
+
+    - answer_pipeline: time spent in generate_answer (retrieval + LLM).
+    - question_end_to_end: from the last fragment to the stored answer
+      (includes the compose window).
+    - answer_queue_wait: time a finalized question waited for a worker.
+    - gauges answer_queue_depth / answer_queue_in_flight: current queue state.
+    """
+    return metrics.snapshot()
+
+
+@app.delete("/metrics")
+async def reset_metrics() -> dict:
+    """Clear latency samples and counters (e.g. between load-test stages)."""
+    metrics.reset()
+    return metrics.snapshot()
@@ -6,18 +6,57 @@ Streamlit frontend for the Company Handbook Chatbot.
 This app:
 - Manages a per-browser chat session using Streamlit session_state.
 - Sends user questions to the FastAPI backend as fragments.
-- Polls the backend until a final answer is available.
+- Polls the backend for the final answer with adaptive backoff, from a
+  fragment that reruns on its own, so the rest of the UI stays responsive.
+- Reuses one pooled, keep-alive HTTP session for all tabs and reruns.
 """
 
 import time
 import uuid
+from typing import Optional
 
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Change this if your FastAPI app is running on a different host/port.
 API_BASE_URL = "http://localhost:8000"
 
+WAITING_MSG = "(Answer is not ready yet, or no complete question has been detected.)"
+
+# Polling schedule for a pending answer: the fragment ticks every
+# POLL_TICK_SECONDS and calls the backend when the current interval is over.
+POLL_TICK_SECONDS = 0.5
+POLL_INITIAL_INTERVAL = 1.0
+POLL_MAX_INTERVAL = 5.0
+POLL_BACKOFF = 1.5
+POLL_TIMEOUT_SECONDS = 120
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Return the shared HTTP session (created once per Streamlit server process).
+
+    Connections to the backend are pooled and kept alive across reruns and
+    browser tabs. Idempotent GETs are retried on connection errors and
+    502/503/504 responses, honouring Retry-After; POSTs are never retried.
+    """
+    retry = Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 def init_session_state() -> None:
     """Initialize Streamlit session state variables (only once)."""
@@ -30,25 +69,25 @@ def init_session_state() -> None:
         # Store chat history as a list of messages:
         # [{"role": "user" | "assistant", "content": "..."}]
         st.session_state.messages = []
+    if "pending" not in st.session_state:
+        # Answer being waited for: {"user_id", "chat_id", "sent_at", "interval", "next_poll_at"}
+        st.session_state.pending = None
 
 
-def call_chatbot_api(user_id: str, chat_id: str, question: str) -> str:
+def send_question(user_id: str, chat_id: str, question: str) -> Optional[str]:
     """
-    Send a question fragment to the FastAPI backend, then poll for the final answer.
+    Send a question fragment to POST /chatbot_query.
 
-    This uses:
-      - POST /chatbot_query
-      - GET  /chatbot_result/{user_id}/{chat_id}
+    Returns None when the fragment was accepted, otherwise the message to show
+    instead of an answer (error, or "busy, retry after" when the backend sheds load).
     """
     payload = {
         "user_id": user_id,
         "chat_id": chat_id,
         "question": question,
     }
-
-    # 1) Send fragment to /chatbot_query
     try:
-        requests.post(
+        resp = get_http_session().post(
             f"{API_BASE_URL}/chatbot_query",
             json=payload,
             timeout=30,
@@ -56,32 +95,79 @@ def call_chatbot_api(user_id: str, chat_id: str, question: str) -> str:
     except Exception as exc:  # noqa: BLE001
         return f"(Error calling backend: {exc})"
 
-    # 2) Poll /chatbot_result until answer is ready
-    waiting_msg = (
-        "(Answer is not ready yet, or no complete question has been detected.)"
-    )
-    poll_interval = 1.0
-
-    while True:
+    if resp.status_code == 503:
+        retry_after = resp.headers.get("Retry-After", "a few")
         try:
-            resp = requests.get(
-                f"{API_BASE_URL}/chatbot_result/{user_id}/{chat_id}",
-                timeout=30,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception as exc:  # noqa: BLE001
-            return f"(Error getting result from backend: {exc})"
+            return resp.json()["answer"]
+        except Exception:  # noqa: BLE001
+            return f"(The assistant is busy right now. Please retry in {retry_after} seconds.)"
+    if resp.status_code >= 400:
+        return f"(Error calling backend: HTTP {resp.status_code})"
+    return None
+
+
+def fetch_result(user_id: str, chat_id: str) -> Optional[str]:
+    """
+    Poll GET /chatbot_result once.
+    Returns the answer, or None while it is not ready yet.
+    """
+    try:
+        resp = get_http_session().get(
+            f"{API_BASE_URL}/chatbot_result/{user_id}/{chat_id}",
+            timeout=30,
+        )
+        resp.raise_for_status()
+        answer = resp.json().get("answer", "")
+    except Exception as exc:  # noqa: BLE001
+        return f"(Error getting result from backend: {exc})"
 
-        answer = data.get("answer", "")
+    # The backend says the answer is not ready yet → keep waiting
+    if answer.strip() == WAITING_MSG:
+        return None
+    return answer
 
-        # If the backend says the answer is not ready yet → keep waiting
-        if answer.strip() == waiting_msg:
-            time.sleep(poll_interval)
-            continue
 
-        # When the backend returns a real answer → return it
-        return answer
+def start_pending(user_id: str, chat_id: str) -> None:
+    """Start (or restart, after another fragment) waiting for an answer."""
+    now = time.time()
+    st.session_state.pending = {
+        "user_id": user_id,
+        "chat_id": chat_id,
+        "sent_at": now,
+        "interval": POLL_INITIAL_INTERVAL,
+        "next_poll_at": now + POLL_INITIAL_INTERVAL,
+    }
+
+
+@st.fragment(run_every=POLL_TICK_SECONDS)
+def pending_answer() -> None:
+    """
+    Show the pending answer placeholder and poll with adaptive backoff.
+
+    Only this fragment reruns while waiting; once the answer arrives it is
+    added to the history and the whole app reruns once to render it.
+    """
+    pending = st.session_state.pending
+    if pending is None:
+        return
+
+    now = time.time()
+    answer = None
+    if now - pending["sent_at"] > POLL_TIMEOUT_SECONDS:
+        answer = "(No answer received from the backend. Please try again.)"
+    elif now >= pending["next_poll_at"]:
+        answer = fetch_result(pending["user_id"], pending["chat_id"])
+        if answer is None:
+            pending["interval"] = min(pending["interval"] * POLL_BACKOFF, POLL_MAX_INTERVAL)
+            pending["next_poll_at"] = now + pending["interval"]
+
+    if answer is not None:
+        st.session_state.messages.append({"role": "assistant", "content": answer})
+        st.session_state.pending = None
+        st.rerun()
+
+    with st.chat_message("assistant"):
+        st.markdown(f"_Thinking... ({now - pending['sent_at']:.0f}s)_")
 
 
 def main() -> None:
@@ -112,6 +198,7 @@ def main() -> None:
             # Start a new conversation: reset chat_id and history.
             st.session_state.chat_id = str(uuid.uuid4())
             st.session_state.messages = []
+            st.session_state.pending = None
             st.success("Started a new chat session.")
 
     st.write(f"**Chat ID:** `{st.session_state.chat_id}`")
@@ -133,20 +220,24 @@ def main() -> None:
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        # 3) Call backend and render assistant response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                answer = call_chatbot_api(
-                    st.session_state.user_id,
-                    st.session_state.chat_id,
-                    user_input,
-                )
-                st.markdown(answer)
-
-        # 4) Append assistant answer to history
-        st.session_state.messages.append(
-            {"role": "assistant", "content": answer}
+        # 3) Send the fragment; the answer is polled for by pending_answer()
+        error = send_question(
+            st.session_state.user_id,
+            st.session_state.chat_id,
+            user_input,
         )
+        if error is None:
+            start_pending(st.session_state.user_id, st.session_state.chat_id)
+        else:
+            st.session_state.messages.append(
+                {"role": "assistant", "content": error}
+            )
+            with st.chat_message("assistant"):
+                st.markdown(error)
+
+    # 4) While an answer is pending, only this fragment reruns
+    if st.session_state.pending is not None:
+        pending_answer()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+# batch_qa.py
+
+"""
+Batch question answering for the RAG system.
+
+Responsibilities:
+- Load a file of questions (.txt one per line, .jsonl, or .json).
+- Embed all questions with one batched encode call.
+- Query ChromaDB with many query vectors per call.
+- Run LLM calls concurrently under a limit; BATCH_LLM_CONCURRENCY also caps
+  the batch LLM calls of all concurrent batches in this process together.
+- Yield results in input order, so they can be streamed as JSONL.
+
+CLI usage:
+    python batch_qa.py questions.txt -o answers.jsonl --concurrency 4
+"""
+
+import argparse
+import json
+import sys
+import threading
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import BATCH_LLM_CONCURRENCY, DEFAULT_CORPUS
+from rag_core import answer_from_contexts, embed_queries, query_contexts_for_questions
+
+# Maximum number of query vectors sent to Chroma in one query call
+QUERY_BATCH_SIZE = 100
+
+# Process-wide cap on batch LLM calls, shared by all running batches
+_llm_slots = threading.BoundedSemaphore(BATCH_LLM_CONCURRENCY)
+
+
+def load_batch_questions(path: str) -> List[str]:
+    """
+    Load questions from a file.
+
+    Supported formats:
+    - .txt:   one question per line (blank lines ignored)
+    - .jsonl: one JSON string or {"question": "..."} object per line
+    - .json:  a list of strings / {"question": ...} objects, or
+              {"section_name": ["question 1", ...], ...} (tts_questions.json format)
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        if path.endswith(".jsonl"):
+            items: List[Any] = [json.loads(line) for line in file if line.strip()]
+        elif path.endswith(".json"):
+            data = json.load(file)
+            if isinstance(data, dict):
+                items = [q for question_list in data.values() for q in question_list]
+            else:
+                items = list(data)
+        else:
+            items = [line.strip() for line in file if line.strip()]
+
+    return [item["question"] if isinstance(item, dict) else str(item) for item in items]
+
+
+def _answer_one(index: int, question: str, contexts: List[Dict]) -> Dict[str, Any]:
+    try:
+        with _llm_slots:
+            result = answer_from_contexts(question, contexts)
+    except Exception as exc:  # noqa: BLE001
+        return {
+            "index": index,
+            "question": question,
+            "answer": None,
+            "sources": [],
+            "citations": [],
+            "error": str(exc),
+        }
+    return {"index": index, "question": question, **result}
+
+
+def answer_batch(
+    questions: List[str],
+    top_k: int = 10,
+    max_concurrency: int = BATCH_LLM_CONCURRENCY,
+    corpus: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Answer many questions against `corpus` and yield one result dict per
+    question, in input order.
+
+    Each result contains: index, question, answer, sources, citations (and
+    error on failure).
+    A result is yielded as soon as it and every result before it are done.
+    """
+    if not questions:
+        return
+
+    # 1) One batched encode call for every question
+    query_vectors = embed_queries(questions)
+
+    # 2) Retrieve contexts with many query vectors per Chroma call
+    all_contexts: List[List[Dict]] = []
+    for start in range(0, len(query_vectors), QUERY_BATCH_SIZE):
+        end = start + QUERY_BATCH_SIZE
+        all_contexts.extend(
+            query_contexts_for_questions(
+                questions[start:end], query_vectors[start:end], top_k=top_k, corpus=corpus
+            )
+        )
+
+    # 3) Concurrent LLM calls, results yielded in input order
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = [
+            pool.submit(_answer_one, index, question, contexts)
+            for index, (question, contexts) in enumerate(zip(questions, all_contexts))
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def main() -> None:
+    """Answer a file of questions and write JSONL results."""
+    parser = argparse.ArgumentParser(description="Answer a file of questions in batch.")
+    parser.add_argument("questions_file", help=".txt, .jsonl or .json file of questions")
+    parser.add_argument("-o", "--output", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--concurrency", type=int, default=BATCH_LLM_CONCURRENCY,
+                        help="Maximum concurrent LLM calls.")
+    args = parser.parse_args()
+
+    questions = load_batch_questions(args.questions_file)
+    print(f"[INFO] Loaded {len(questions)} questions.", file=sys.stderr)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        # Keep pipeline debug prints out of the JSONL stream
+        with redirect_stdout(sys.stderr):
+            for result in answer_batch(
+                questions, top_k=args.top_k, max_concurrency=args.concurrency, corpus=args.corpus
+            ):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# bench_embeddings.py
+
+"""
+Benchmark the embedding backends on CPU.
+
+For each backend this script measures:
+- Query throughput (queries/s): one "query: " text per encode call, as in serving
+- Ingest throughput (chunks/s): batched "passage: " encoding of handbook chunks
+- Parity: minimum cosine similarity against the torch fp32 backend
+
+Throughput is always measured with real encode calls. The torch reference
+vectors for the parity check come from the on-disk embedding cache
+(embedding_cache.py) when available, so the reference model is only loaded
+for texts that were never embedded before.
+
+Usage:
+    python bench_embeddings.py
+    python bench_embeddings.py --backends torch,onnx-int8 --chunks 500 --threads 4
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from config import EMBEDDING_MODEL_NAME, PAGES_DIR
+from embedding_cache import get_embedding_cache
+from embedding_backends import (
+    EMBEDDING_BACKENDS,
+    EMBEDDING_COSINE_TOLERANCE,
+    encode_texts,
+    load_embedding_model,
+    min_cosine_similarity,
+)
+from ingest_handbook import read_markdown_file, simple_chunk_text
+
+QUESTIONS_FILE = "tts_questions.json"
+
+FALLBACK_QUESTIONS = [
+    "What is the leave policy for employees?",
+    "How do I connect to the office Wi-Fi?",
+    "How does the hiring process at TTS generally work?",
+    "Chính sách nghỉ phép cho nhân viên là gì?",
+    "Làm thế nào để cài đặt Slack?",
+]
+
+
+def load_benchmark_questions(limit: int) -> List[str]:
+    """Load up to `limit` questions from QUESTIONS_FILE (or use built-in samples)."""
+    questions: List[str] = []
+    if os.path.exists(QUESTIONS_FILE):
+        with open(QUESTIONS_FILE, "r", encoding="utf-8") as file:
+            for question_list in json.load(file).values():
+                questions.extend(question_list)
+    if not questions:
+        questions = list(FALLBACK_QUESTIONS)
+    while len(questions) < limit:
+        questions.extend(questions)
+    return questions[:limit]
+
+
+def load_benchmark_chunks(limit: int) -> List[str]:
+    """Chunk handbook pages until `limit` chunks are collected."""
+    chunks: List[str] = []
+    for root, _, files in sorted(os.walk(PAGES_DIR)):
+        for fname in sorted(files):
+            if not fname.endswith(".md"):
+                continue
+            chunks.extend(simple_chunk_text(read_markdown_file(os.path.join(root, fname))))
+            if len(chunks) >= limit:
+                return chunks[:limit]
+    return chunks
+
+
+def reference_embeddings(queries: List[str], passages: List[str], threads: int) -> np.ndarray:
+    """Torch fp32 embeddings of "query: " + queries followed by "passage: " + passages."""
+    model = None
+
+    def encode(texts: List[str]) -> np.ndarray:
+        nonlocal model
+        if model is None:
+            model = load_embedding_model(EMBEDDING_MODEL_NAME, "torch", threads or None)
+        return encode_texts(model, texts)
+
+    cache = get_embedding_cache("torch")
+    if cache is None:
+        return encode([f"query: {q}" for q in queries] + [f"passage: {p}" for p in passages])
+    return np.concatenate(
+        [cache.encode(queries, encode, prefix="query: "), cache.encode(passages, encode, prefix="passage: ")]
+    )
+
+
+def main() -> None:
+    """Run the embedding backend benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark CPU embedding backends.")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS))
+    parser.add_argument("--queries", type=int, default=200, help="Number of single-query encodes.")
+    parser.add_argument("--chunks", type=int, default=300, help="Number of passages to batch-encode.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = all cores).")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    raw_questions = load_benchmark_questions(args.queries)
+    raw_chunks = load_benchmark_chunks(args.chunks)
+    questions = [f"query: {q}" for q in raw_questions]
+    passages = [f"passage: {c}" for c in raw_chunks]
+    parity_texts = questions[:50] + passages[:50]
+
+    print(f"Model: {EMBEDDING_MODEL_NAME}")
+    print(f"{len(questions)} queries, {len(passages)} passages, batch size {args.batch_size}\n")
+
+    reference = reference_embeddings(raw_questions[:50], raw_chunks[:50], args.threads)
+
+    print(f"{'backend':<10} {'load s':>8} {'queries/s':>10} {'chunks/s':>10} {'min cos':>9}  tolerance")
+    for backend in (["torch"] if "torch" in backends else []) + [b for b in backends if b != "torch"]:
+        started = time.perf_counter()
+        model = load_embedding_model(EMBEDDING_MODEL_NAME, backend, args.threads or None)
+        load_seconds = time.perf_counter() - started
+
+        # Warm-up run so lazy graph initialization is not measured
+        encode_texts(model, questions[:4])
+
+        started = time.perf_counter()
+        for question in questions:
+            encode_texts(model, [question])
+        queries_per_second = len(questions) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        encode_texts(model, passages, batch_size=args.batch_size)
+        chunks_per_second = len(passages) / (time.perf_counter() - started)
+
+        embeddings = encode_texts(model, parity_texts)
+        min_cos = min_cosine_similarity(embeddings, reference)
+        tolerance = EMBEDDING_COSINE_TOLERANCE[backend]
+        status = "OK" if 1.0 - min_cos <= tolerance else "OUT OF TOLERANCE"
+
+        print(
+            f"{backend:<10} {load_seconds:8.2f} {queries_per_second:10.1f} "
+            f"{chunks_per_second:10.1f} {min_cos:9.5f}  1 - {tolerance:g} ({status})"
+        )
+        del model
+
+
+if __name__ == "__main__":
+    main()
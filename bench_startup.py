@@ -0,0 +1,85 @@
+# bench_startup.py
+
+"""
+Startup benchmark for the RAG system.
+
+Measures, in fresh Python processes:
+- Import time of each entry-point module (no model / database loading)
+- Optionally, the time taken by config.warm_up() to load every resource
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --repeat 10 --warm-up
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List
+
+MODULES = [
+    "config",
+    "conversation_logger",
+    "session_manager",
+    "rag_core",
+    "ingest_handbook",
+    "api",
+]
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+WARM_UP_SNIPPET = (
+    "import time; import config; t = time.perf_counter(); "
+    "config.warm_up(load_llm_client=False); print(time.perf_counter() - t)"
+)
+
+
+def time_snippet(snippet: str, repeat: int) -> List[float]:
+    """Run a snippet in `repeat` fresh interpreters and return the timings (seconds)."""
+    timings: List[float] = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", snippet],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip())
+        timings.append(float(proc.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def report(label: str, timings: List[float]) -> None:
+    """Print median / min / max for one measurement."""
+    print(
+        f"{label:<22} median={statistics.median(timings) * 1000:8.1f} ms  "
+        f"min={min(timings) * 1000:8.1f} ms  max={max(timings) * 1000:8.1f} ms"
+    )
+
+
+def main() -> None:
+    """Run the startup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh processes per measurement.")
+    parser.add_argument("--warm-up", action="store_true", help="Also time config.warm_up().")
+    args = parser.parse_args()
+
+    print(f"Import time over {args.repeat} fresh processes:")
+    for module in MODULES:
+        try:
+            report(module, time_snippet(IMPORT_SNIPPET.format(module=module), args.repeat))
+        except RuntimeError as exc:
+            last_line = (str(exc).splitlines() or ["unknown error"])[-1]
+            print(f"{module:<22} FAILED: {last_line}")
+
+    if args.warm_up:
+        print("\nWarm-up time (embedding model + Chroma collection):")
+        report("config.warm_up", time_snippet(WARM_UP_SNIPPET, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# citations.py
+
+"""
+Local, chunk-level citations for generated answers.
+
+Responsibilities:
+- Split an answer into sentences (with character offsets).
+- Match every sentence to the retrieved chunk that supports it, first by word
+  n-gram overlap, then (for sentences without a lexical match, e.g. a
+  Vietnamese answer grounded on English chunks) by embedding similarity
+  against the chunk vectors returned by retrieval.
+- Return only the supporting chunks, with character offsets of the supporting
+  span, and one source entry per file.
+
+No LLM call is involved; the only model work is one batched encode of the
+sentences that have no lexical match.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import CITATION_MIN_OVERLAP, CITATION_MIN_SIMILARITY
+
+# Candidate sentence ends: . ! ? followed by whitespace / end of text, or a
+# line break (list items in markdown answers)
+_BOUNDARY_RE = re.compile(r"[.!?]+(?=\s|$)|\n")
+
+# Tokens ending in "." that do not end a sentence
+ABBREVIATIONS = {
+    "e.g.", "i.e.", "etc.", "vs.", "approx.", "incl.", "no.", "fig.",
+    "mr.", "mrs.", "ms.", "dr.", "jr.", "sr.", "st.", "a.m.", "p.m.", "u.s.",
+}
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Sentences with fewer words are not cited ("Yes.", "Sources:")
+MIN_SENTENCE_WORDS = 4
+
+
+def _is_sentence_end(text: str, match: "re.Match") -> bool:
+    if match.group() == "\n":
+        return True
+    rest = text[match.end():].lstrip()
+    if rest and not rest[0].isupper():
+        return False
+    token = text[:match.end()].split()[-1].lower()
+    return token not in ABBREVIATIONS
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    Return (start, end) character offsets of the sentences in `text`.
+
+    A sentence ends at terminal punctuation followed by whitespace and an
+    uppercase letter (or the end of the text), or at a line break. Common
+    abbreviations ("e.g.", "U.S.") and numbers ("v1.2", "2.5") do not split.
+    """
+    spans = []
+    start = 0
+    ends = [m.end() for m in _BOUNDARY_RE.finditer(text) if _is_sentence_end(text, m)]
+    for end in ends + [len(text)]:
+        span_start, span_end = start, end
+        while span_start < span_end and text[span_start].isspace():
+            span_start += 1
+        while span_end > span_start and text[span_end - 1].isspace():
+            span_end -= 1
+        if span_start < span_end:
+            spans.append((span_start, span_end))
+        start = end
+    return spans
+
+
+def _words(text: str) -> List[str]:
+    return [word.lower() for word in _WORD_RE.findall(text)]
+
+
+def _ngrams(words: Sequence[str]) -> set:
+    """Word bigrams, or unigrams for one-word texts."""
+    if len(words) < 2:
+        return set(words)
+    return set(zip(words, words[1:]))
+
+
+def ngram_overlap(sentence: str, text: str) -> float:
+    """Share of the sentence's word bigrams that also occur in `text` (0..1)."""
+    sentence_grams = _ngrams(_words(sentence))
+    if not sentence_grams:
+        return 0.0
+    return len(sentence_grams & _ngrams(_words(text))) / len(sentence_grams)
+
+
+def supporting_span(sentence: str, chunk_text: str) -> Tuple[int, int]:
+    """
+    Character offsets of the chunk sentence that best overlaps `sentence`.
+    Falls back to the whole chunk when no chunk sentence shares a bigram.
+    """
+    best, best_overlap = (0, len(chunk_text)), 0.0
+    for start, end in split_sentences(chunk_text):
+        overlap = ngram_overlap(sentence, chunk_text[start:end])
+        if overlap > best_overlap:
+            best, best_overlap = (start, end), overlap
+    return best
+
+
+def cite_answer(
+    answer: str,
+    contexts: List[Dict],
+    embed_sentences: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    min_overlap: float = CITATION_MIN_OVERLAP,
+    min_similarity: float = CITATION_MIN_SIMILARITY,
+) -> Dict[str, List[Dict]]:
+    """
+    Attribute the sentences of `answer` to the retrieved `contexts`.
+
+    `contexts` are the retrieval results (id, text, metadata and, optionally,
+    the chunk "embedding"). `embed_sentences` embeds answer sentences into the
+    same space; without it (or without chunk embeddings) only n-gram overlap is used.
+
+    Returns:
+    - citations: [{"answer_start", "answer_end", "chunk_id", "source_file",
+                   "chunk_start", "chunk_end", "score", "method"}, ...]
+    - sources:   one entry per cited file, in citation order:
+                 [{"title", "section", "source_file", "chunk_ids"}, ...]
+    """
+    if not answer or not contexts:
+        return {"citations": [], "sources": []}
+
+    spans = [
+        (start, end) for start, end in split_sentences(answer)
+        if len(_words(answer[start:end])) >= MIN_SENTENCE_WORDS
+    ]
+    matches: Dict[int, Tuple[int, float, str]] = {}   # sentence -> (context, score, method)
+
+    # 1) Lexical match
+    unmatched = []
+    for index, (start, end) in enumerate(spans):
+        sentence = answer[start:end]
+        scores = [ngram_overlap(sentence, ctx["text"]) for ctx in contexts]
+        best = int(np.argmax(scores))
+        if scores[best] >= min_overlap:
+            matches[index] = (best, scores[best], "overlap")
+        else:
+            unmatched.append(index)
+
+    # 2) Embedding match for the rest, against the vectors retrieval already returned
+    chunk_vectors = [ctx.get("embedding") for ctx in contexts]
+    if unmatched and embed_sentences is not None and all(v is not None for v in chunk_vectors):
+        chunks = np.asarray(chunk_vectors, dtype=np.float32)
+        chunks /= np.linalg.norm(chunks, axis=1, keepdims=True)
+        sentences = np.asarray(
+            embed_sentences([answer[spans[i][0]:spans[i][1]] for i in unmatched]), dtype=np.float32
+        )
+        sentences /= np.linalg.norm(sentences, axis=1, keepdims=True)
+        similarities = sentences @ chunks.T
+        for row, index in enumerate(unmatched):
+            best = int(np.argmax(similarities[row]))
+            if similarities[row, best] >= min_similarity:
+                matches[index] = (best, float(similarities[row, best]), "embedding")
+
+    citations = []
+    sources: Dict[str, Dict] = {}
+    for index in sorted(matches):
+        context_index, score, method = matches[index]
+        ctx = contexts[context_index]
+        meta = ctx["metadata"]
+        start, end = spans[index]
+        chunk_start, chunk_end = supporting_span(answer[start:end], ctx["text"])
+        citations.append(
+            {
+                "answer_start": start,
+                "answer_end": end,
+                "chunk_id": ctx["id"],
+                "source_file": meta.get("source_file"),
+                "chunk_start": chunk_start,
+                "chunk_end": chunk_end,
+                "score": round(float(score), 4),
+                "method": method,
+            }
+        )
+
+        source = sources.setdefault(
+            meta.get("source_file"),
+            {
+                "title": meta.get("title"),
+                "section": meta.get("section"),
+                "source_file": meta.get("source_file"),
+                "chunk_ids": [],
+            },
+        )
+        if ctx["id"] not in source["chunk_ids"]:
+            source["chunk_ids"].append(ctx["id"])
+
+    return {"citations": citations, "sources": list(sources.values())}
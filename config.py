@@ -4,16 +4,20 @@
 Configuration module for the RAG system.
 Handles:
 - Loading environment variables
-- Gemini client configuration
+- Gemini client and LLM provider configuration
 - Embedding model initialization
 - ChromaDB vector store setup
+
+Heavy resources (embedding model, Chroma client, Gemini client) are created
+lazily on first use through the get_* accessors, so importing this module is
+cheap. Call warm_up() to load everything up front (e.g. on API startup).
 """
 
 import os
+import threading
+from typing import Optional
+
 from dotenv import load_dotenv
-from google import genai
-import chromadb
-from sentence_transformers import SentenceTransformer
 
 # Load environment variables
 load_dotenv()
@@ -21,29 +25,220 @@ load_dotenv()
 # Gemini configuration (LLM for text generation)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is missing. Please set it in the .env file.")
-
-client = genai.Client(api_key=GEMINI_API_KEY)
-
 # Gemini model used for text generation
 GEN_MODEL = "gemini-2.5-flash"
 JUDGE_MODEL = GEN_MODEL
 
+# LLM provider: "gemini" (default) or "stub" (deterministic, offline; see llm_provider.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Circuit breaker: open after N consecutive failures, retry after the cooldown
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Simulated latency of the stub provider (milliseconds)
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "0"))
+
 # Embedding model configuration (Multilingual E5)
 EMBEDDING_MODEL_NAME = "intfloat/multilingual-e5-small"
-embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+# Backend: "torch" (default), "onnx" or "onnx-int8" (see embedding_backends.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Intra-op CPU threads for the embedder (0 = use all CPU cores)
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+# Persistent passage embedding cache shared by ingest and benchmarks (see embedding_cache.py)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+
+# Admission control for the answer pipeline (see admission.py)
+ANSWER_MAX_CONCURRENCY = int(os.getenv("ANSWER_MAX_CONCURRENCY", "4"))
+ANSWER_QUEUE_MAX_SIZE = int(os.getenv("ANSWER_QUEUE_MAX_SIZE", "64"))
+ANSWER_QUEUE_MAX_PER_USER = int(os.getenv("ANSWER_QUEUE_MAX_PER_USER", "2"))
+
+# Batch question answering (see batch_qa.py)
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+# Batch requests running at once (globally / per user); more are shed with 503
+BATCH_MAX_CONCURRENT_REQUESTS = int(os.getenv("BATCH_MAX_CONCURRENT_REQUESTS", "2"))
+BATCH_MAX_PER_USER = int(os.getenv("BATCH_MAX_PER_USER", "1"))
+
+# Multilingual retrieval (see language.py): also search with an English
+# glossary translation of Vietnamese questions and merge the results
+DUAL_LANGUAGE_RETRIEVAL = os.getenv("DUAL_LANGUAGE_RETRIEVAL", "0") == "1"
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "4096"))
+
+# Retrieval confidence gate (see retrieval_gate.py): below RETRIEVAL_MIN_CONFIDENCE
+# the fixed "not found" message is returned without calling the LLM.
+# Calibrate with: python retrieval_gate.py --questions tts_questions.json
+RETRIEVAL_GATE_ENABLED = os.getenv("RETRIEVAL_GATE_ENABLED", "1") == "1"
+RETRIEVAL_MIN_CONFIDENCE = float(os.getenv("RETRIEVAL_MIN_CONFIDENCE", "0.80"))
+# Weight of the question/context word overlap added to the top cosine similarity
+RETRIEVAL_LEXICAL_WEIGHT = float(os.getenv("RETRIEVAL_LEXICAL_WEIGHT", "0.05"))
+
+# Local answer citations (see citations.py): a chunk supports an answer sentence
+# if enough of the sentence's words occur in it, or if their embeddings are close
+CITATION_MIN_OVERLAP = float(os.getenv("CITATION_MIN_OVERLAP", "0.5"))
+CITATION_MIN_SIMILARITY = float(os.getenv("CITATION_MIN_SIMILARITY", "0.87"))
 
 # Dataset paths
 PAGES_DIR = "./pages"          # Directory containing markdown files
 CHROMA_DIR = "./chroma_db"     # Directory for Chroma vector database
 
-# ChromaDB client and collection setup
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-
+# Legacy collection of the default corpus (used until the first versioned rebuild)
 COLLECTION_NAME = "handbook_chunks"
 
-collection = chroma_client.get_or_create_collection(
-    name=COLLECTION_NAME,
-    metadata={"description": "TTS Handbook markdown chunks processed with E5 embeddings"},
-)
+# Corpora are named, versioned collections (see corpus_registry.py)
+DEFAULT_CORPUS = os.getenv("DEFAULT_CORPUS", "handbook")
+# Number of collection versions kept per corpus after a rebuild
+CORPUS_VERSIONS_TO_KEEP = int(os.getenv("CORPUS_VERSIONS_TO_KEEP", "2"))
+
+# Memory-mapped collection snapshots for a fast warm start (see snapshot.py)
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1") == "1"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+# /ready reports "ready" once the p99 of the warm-up queries is within this target
+READY_P99_TARGET_MS = float(os.getenv("READY_P99_TARGET_MS", "250"))
+
+# Precomputed answers for frequent questions (see faq_index.py)
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "1") == "1"
+FAQ_COLLECTION_NAME = "faq_answers"
+# Maximum cosine distance between a question and a stored FAQ question to reuse its answer
+FAQ_MAX_DISTANCE = float(os.getenv("FAQ_MAX_DISTANCE", "0.04"))
+
+# ==== Lazy, thread-safe resource accessors ====
+
+_client = None
+_client_lock = threading.Lock()
+
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+_chroma_client = None
+_chroma_client_lock = threading.Lock()
+
+_collections: dict = {}          # collection name -> Chroma collection
+_collections_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the shared Gemini client, creating it on first use.
+
+    Raises ValueError if GEMINI_API_KEY is not set.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not GEMINI_API_KEY:
+                    raise ValueError("GEMINI_API_KEY is missing. Please set it in the .env file.")
+                from google import genai
+                from google.genai import types
+
+                _client = genai.Client(
+                    api_key=GEMINI_API_KEY,
+                    http_options=types.HttpOptions(timeout=int(LLM_TIMEOUT_SECONDS * 1000)),
+                )
+    return _client
+
+
+def get_embedding_model():
+    """
+    Return the shared SentenceTransformer model, loading it on first use
+    with the backend selected by EMBEDDING_BACKEND.
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                from embedding_backends import load_embedding_model
+
+                _embedding_model = load_embedding_model(
+                    EMBEDDING_MODEL_NAME,
+                    backend=EMBEDDING_BACKEND,
+                    num_threads=EMBEDDING_NUM_THREADS or None,
+                )
+    return _embedding_model
+
+
+def get_chroma_client():
+    """Return the shared persistent Chroma client, opening the database on first use."""
+    global _chroma_client
+    if _chroma_client is None:
+        with _chroma_client_lock:
+            if _chroma_client is None:
+                import chromadb
+
+                _chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+    return _chroma_client
+
+
+def _get_cached_collection(name: str, metadata: dict):
+    collection = _collections.get(name)
+    if collection is None:
+        with _collections_lock:
+            collection = _collections.get(name)
+            if collection is None:
+                collection = get_chroma_client().get_or_create_collection(name=name, metadata=metadata)
+                _collections[name] = collection
+    return collection
+
+
+def get_collection(corpus: Optional[str] = None):
+    """
+    Return the active Chroma collection of `corpus` (default: DEFAULT_CORPUS).
+
+    The corpus alias is resolved on every call (one os.stat), so a rebuilt
+    index becomes visible as soon as ingestion switches the alias.
+    With SNAPSHOT_ENABLED, a memory-mapped snapshot of the active collection
+    is returned instead when one was exported (see snapshot.py).
+    Raises KeyError for an unknown corpus.
+    """
+    from corpus_registry import resolve_collection_name
+
+    name = resolve_collection_name(corpus)
+    if SNAPSHOT_ENABLED:
+        from snapshot import load_snapshot
+
+        snapshot = load_snapshot(name)
+        if snapshot is not None:
+            return snapshot
+
+    return _get_cached_collection(
+        name,
+        {"description": "TTS Handbook markdown chunks processed with E5 embeddings"},
+    )
+
+
+def get_faq_collection(corpus: Optional[str] = None):
+    """Return the Chroma collection of precomputed FAQ answers for `corpus` (cosine space)."""
+    corpus = corpus or DEFAULT_CORPUS
+    name = FAQ_COLLECTION_NAME if corpus == DEFAULT_CORPUS else f"{FAQ_COLLECTION_NAME}__{corpus}"
+    return _get_cached_collection(
+        name,
+        {
+            "description": f"Precomputed answers for frequent questions ({corpus})",
+            "hnsw:space": "cosine",
+        },
+    )
+
+
+def forget_collection(name: str) -> None:
+    """Drop a cached collection handle (e.g. after the collection was deleted)."""
+    with _collections_lock:
+        _collections.pop(name, None)
+
+
+def warm_up(load_llm_client: bool = True) -> None:
+    """
+    Eagerly load every lazy resource.
+
+    Intended for long-running processes (e.g. the FastAPI startup event) so the
+    first user request does not pay the model and database load time.
+    """
+    get_embedding_model()
+    get_collection()
+    if FAQ_ENABLED:
+        get_faq_collection()
+    if load_llm_client:
+        from llm_provider import get_llm_provider
+
+        get_llm_provider()
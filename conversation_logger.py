@@ -3,16 +3,23 @@
 from datetime import datetime
 from pathlib import Path
 import json
-from typing import Optional
+from typing import Any, Dict, Optional
 
 # Log file path
 LOG_PATH = Path("chat_logs.jsonl")
+# Retrieval confidence gate decisions (see retrieval_gate.py)
+GATE_LOG_PATH = Path("gate_decisions.jsonl")
 
 
-def log_interaction(question: str, answer: str, question_id: Optional[str] = None) -> None:
+def log_interaction(
+    question: str,
+    answer: str,
+    question_id: Optional[str] = None,
+    corpus: Optional[str] = None,
+) -> None:
     """
     Record each question and answer into a JSON Lines file.
-    Each line is an object: {timestamp, question_id, question, answer}
+    Each line is an object: {timestamp, question_id, question, answer[, corpus]}
     """
     entry = {
         "timestamp": datetime.utcnow().isoformat(),  # UTC time
@@ -20,7 +27,25 @@ def log_interaction(question: str, answer: str, question_id: Optional[str] = Non
         "question": question,
         "answer": answer,
     }
+    if corpus:
+        entry["corpus"] = corpus
 
     # Open the file in append mode, add 1 more line of JSON
     with LOG_PATH.open("a", encoding="utf-8") as f:
         f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def log_gate_decision(question: str, decision: Dict[str, Any]) -> None:
+    """
+    Record one retrieval confidence gate decision into GATE_LOG_PATH.
+    Each line is an object: {timestamp, question, confidence, top_similarity,
+    lexical_overlap, threshold, passed, follow_up}; follow-ups are never
+    rejected, whatever "passed" says.
+    """
+    entry = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "question": question,
+        **decision,
+    }
+    with GATE_LOG_PATH.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -0,0 +1,207 @@
+# corpus_registry.py
+
+"""
+Corpus registry: named corpora backed by versioned Chroma collections.
+
+Responsibilities:
+- Map each corpus name (e.g. "handbook", "hr", "it") to its active versioned
+  collection ("<corpus>__v<timestamp>") through an alias file.
+- Switch an alias atomically (write + os.replace), so a running API picks up a
+  rebuilt index on its next request without a restart.
+- List and garbage-collect old collection versions (and their snapshots);
+  remove the alias of a throwaway corpus.
+
+The default corpus falls back to the legacy COLLECTION_NAME collection until
+it is rebuilt through ingest_handbook.py for the first time; after that,
+garbage collection removes the legacy collection like any old version.
+
+Usage:
+    python corpus_registry.py list
+    python corpus_registry.py gc --corpus handbook --keep 2
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import (
+    CHROMA_DIR,
+    COLLECTION_NAME,
+    CORPUS_VERSIONS_TO_KEEP,
+    DEFAULT_CORPUS,
+    forget_collection,
+    get_chroma_client,
+)
+from snapshot import delete_snapshot
+
+ALIASES_PATH = os.path.join(CHROMA_DIR, "corpus_aliases.json")
+
+_CORPUS_NAME_RE = re.compile(r"^[a-zA-Z0-9](?:[a-zA-Z0-9_-]{0,38}[a-zA-Z0-9])?$")
+
+_aliases: Dict[str, str] = {}
+_aliases_mtime: Optional[float] = None
+_aliases_lock = threading.Lock()
+
+
+def validate_corpus_name(corpus: str) -> str:
+    """Return `corpus` if it is a valid corpus name, otherwise raise ValueError."""
+    if not _CORPUS_NAME_RE.match(corpus) or "__" in corpus:
+        raise ValueError(
+            f"Invalid corpus name '{corpus}': use 1-40 letters, digits, '-' or '_' "
+            "(no '__', must start and end with a letter or digit)."
+        )
+    return corpus
+
+
+def read_aliases() -> Dict[str, str]:
+    """
+    Return the {corpus: collection_name} alias map.
+
+    The file is only re-read when its modification time changes, so calling
+    this on every request costs a single os.stat.
+    """
+    global _aliases, _aliases_mtime
+    try:
+        mtime = os.stat(ALIASES_PATH).st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime != _aliases_mtime:
+        with _aliases_lock:
+            if mtime is None:
+                _aliases = {}
+            else:
+                with open(ALIASES_PATH, "r", encoding="utf-8") as file:
+                    _aliases = json.load(file)
+            _aliases_mtime = mtime
+    return dict(_aliases)
+
+
+def _update_aliases(corpus: str, collection_name: Optional[str]) -> None:
+    """Set (or, with None, remove) the alias of `corpus`, atomically replacing the alias file."""
+    with _aliases_lock:
+        aliases = {}
+        if os.path.exists(ALIASES_PATH):
+            with open(ALIASES_PATH, "r", encoding="utf-8") as file:
+                aliases = json.load(file)
+        if collection_name is None:
+            aliases.pop(corpus, None)
+        else:
+            aliases[corpus] = collection_name
+
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        tmp_path = f"{ALIASES_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(aliases, file, indent=2, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, ALIASES_PATH)
+
+
+def set_alias(corpus: str, collection_name: str) -> None:
+    """Point `corpus` at `collection_name`."""
+    validate_corpus_name(corpus)
+    _update_aliases(corpus, collection_name)
+    print(f"[INFO] Corpus '{corpus}' now points to collection '{collection_name}'.")
+
+
+def remove_alias(corpus: str) -> None:
+    """Forget `corpus`; its collection versions are left to garbage_collect."""
+    validate_corpus_name(corpus)
+    _update_aliases(corpus, None)
+    print(f"[INFO] Removed the alias of corpus '{corpus}'.")
+
+
+def resolve_collection_name(corpus: Optional[str] = None) -> str:
+    """
+    Return the active collection name for `corpus` (default: DEFAULT_CORPUS).
+
+    Raises KeyError for an unknown corpus.
+    """
+    corpus = corpus or DEFAULT_CORPUS
+    name = read_aliases().get(corpus)
+    if name is not None:
+        return name
+    if corpus == DEFAULT_CORPUS:
+        return COLLECTION_NAME
+    raise KeyError(f"Unknown corpus '{corpus}'.")
+
+
+def corpus_exists(corpus: Optional[str]) -> bool:
+    """True if `corpus` can be queried."""
+    return not corpus or corpus == DEFAULT_CORPUS or corpus in read_aliases()
+
+
+def new_version_name(corpus: str) -> str:
+    """Name for a new collection version of `corpus`."""
+    validate_corpus_name(corpus)
+    return f"{corpus}__v{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}"
+
+
+def list_versions(corpus: str) -> List[str]:
+    """All collection versions of `corpus`, oldest first."""
+    prefix = f"{corpus}__v"
+    names = [getattr(c, "name", c) for c in get_chroma_client().list_collections()]
+    return sorted(name for name in names if name.startswith(prefix))
+
+
+def garbage_collect(corpus: str, keep: int = CORPUS_VERSIONS_TO_KEEP) -> List[str]:
+    """
+    Delete old versions of `corpus`, keeping the `keep` newest ones.
+
+    The active version is never deleted. For the default corpus, the legacy
+    COLLECTION_NAME collection counts as its oldest version: it is deleted
+    once the alias points to a versioned collection and `keep` newer
+    versions exist. Returns the deleted collection names.
+    """
+    active = read_aliases().get(corpus)
+    versions = list_versions(corpus)
+    keep_names = set(versions[-keep:]) if keep > 0 else set()
+    if active:
+        keep_names.add(active)
+
+    candidates = list(versions)
+    if corpus == DEFAULT_CORPUS and active and active != COLLECTION_NAME and len(versions) >= keep:
+        existing = {getattr(c, "name", c) for c in get_chroma_client().list_collections()}
+        if COLLECTION_NAME in existing:
+            candidates.insert(0, COLLECTION_NAME)
+
+    deleted = []
+    client = get_chroma_client()
+    for name in candidates:
+        if name in keep_names:
+            continue
+        client.delete_collection(name)
+        forget_collection(name)
+        delete_snapshot(name)
+        deleted.append(name)
+        print(f"[INFO] Deleted old collection version '{name}'.")
+    return deleted
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Inspect and clean up corpus collections.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Show corpora, their active version and all versions.")
+    gc = subparsers.add_parser("gc", help="Delete old collection versions.")
+    gc.add_argument("--corpus", default=DEFAULT_CORPUS)
+    gc.add_argument("--keep", type=int, default=CORPUS_VERSIONS_TO_KEEP)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        aliases = read_aliases()
+        for corpus in sorted(set(aliases) | {DEFAULT_CORPUS}):
+            print(f"{corpus}: active={resolve_collection_name(corpus)}")
+            for name in list_versions(corpus):
+                print(f"    {name}")
+    else:
+        garbage_collect(args.corpus, keep=args.keep)
+
+
+if __name__ == "__main__":
+    main()
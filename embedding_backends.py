@@ -0,0 +1,162 @@
+# embedding_backends.py
+
+"""
+Embedding backend loader for the RAG system.
+
+Supported backends (all run the same intfloat/multilingual-e5-small weights on CPU):
+- "torch":     SentenceTransformer on PyTorch, fp32 (reference backend)
+- "onnx":      ONNX Runtime export of the model, fp32
+- "onnx-int8": ONNX Runtime export with dynamic int8 quantization
+
+Every backend returns a SentenceTransformer object, so callers keep using
+`model.encode(...)` unchanged. The ONNX backends need the optional extra:
+    pip install "sentence-transformers[onnx]"
+
+Parity with the torch backend (minimum cosine similarity per text, measured
+with bench_embeddings.py) must stay within EMBEDDING_COSINE_TOLERANCE. Re-ingest
+the handbook after switching to a backend with a non-zero tolerance so query and
+passage vectors come from the same model; ingest_handbook.py does not reuse
+vectors of a collection built with another backend.
+"""
+
+import os
+import platform
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Maximum allowed (1 - cosine similarity) against the torch fp32 embeddings.
+EMBEDDING_COSINE_TOLERANCE: Dict[str, float] = {
+    "torch": 1e-6,
+    "onnx": 1e-4,
+    "onnx-int8": 2e-2,
+}
+
+# Local directory for exported / quantized ONNX models
+ONNX_EXPORT_DIR = "./onnx_models"
+
+
+def default_quantization_config() -> str:
+    """
+    Pick the int8 quantization preset ("arm64", "avx2", "avx512", "avx512_vnni").
+
+    EMBEDDING_ONNX_QUANTIZATION overrides the choice based on the CPU architecture.
+    """
+    configured = os.getenv("EMBEDDING_ONNX_QUANTIZATION")
+    if configured:
+        return configured
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    return "avx2"
+
+
+def _onnx_session_options(num_threads: int):
+    """Build ONNX Runtime session options with an explicit intra-op thread count."""
+    try:
+        import onnxruntime as ort
+    except ImportError as exc:
+        raise ImportError(
+            "The ONNX embedding backends require onnxruntime. "
+            'Install it with: pip install "sentence-transformers[onnx]"'
+        ) from exc
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(ONNX_EXPORT_DIR, model_name.replace("/", "__"))
+
+
+def _load_quantized_onnx(model_name: str, num_threads: int):
+    """
+    Load the int8 ONNX model, exporting and quantizing it on first use.
+
+    The quantized model is written once under ONNX_EXPORT_DIR and reused afterwards.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    quantization = default_quantization_config()
+    export_dir = _export_dir(model_name)
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        print(f"[INFO] Exporting int8 ({quantization}) ONNX model to {export_dir}...")
+        fp32_model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        fp32_model.save_pretrained(export_dir)
+        export_dynamic_quantized_onnx_model(
+            fp32_model,
+            quantization_config=quantization,
+            model_name_or_path=export_dir,
+            file_suffix=f"qint8_{quantization}",
+        )
+
+    return SentenceTransformer(
+        export_dir,
+        backend="onnx",
+        device="cpu",
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": _onnx_session_options(num_threads),
+        },
+    )
+
+
+def load_embedding_model(
+    model_name: str,
+    backend: str = "torch",
+    num_threads: Optional[int] = None,
+):
+    """
+    Load `model_name` with the selected backend on CPU.
+
+    num_threads sets the intra-op thread count (defaults to os.cpu_count()).
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend '{backend}'. Choose one of: {', '.join(EMBEDDING_BACKENDS)}"
+        )
+
+    num_threads = num_threads or os.cpu_count() or 1
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        import torch
+
+        torch.set_num_threads(num_threads)
+        return SentenceTransformer(model_name, device="cpu")
+
+    if backend == "onnx":
+        return SentenceTransformer(
+            model_name,
+            backend="onnx",
+            device="cpu",
+            model_kwargs={
+                "provider": "CPUExecutionProvider",
+                "session_options": _onnx_session_options(num_threads),
+            },
+        )
+
+    return _load_quantized_onnx(model_name, num_threads)
+
+
+def min_cosine_similarity(candidate: np.ndarray, reference: np.ndarray) -> float:
+    """Return the smallest row-wise cosine similarity between two embedding matrices."""
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    return float(np.min(np.sum(candidate * reference, axis=1)))
+
+
+def encode_texts(model, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+    """Encode texts into a float32 numpy matrix."""
+    return np.asarray(
+        model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True),
+        dtype=np.float32,
+    )
@@ -0,0 +1,208 @@
+# embedding_cache.py
+
+"""
+Persistent, content-addressed embedding cache.
+
+Responsibilities:
+- Store embeddings keyed by (model name + backend, prefix, sha256 of the text),
+  so the same "passage: " text is encoded once across ingest runs, chunker
+  experiments and benchmarks.
+- Keep vectors in an append-only float32 file that is read through a memory
+  map, with a small SQLite index (key -> row).
+- Allow several processes to read at once; writers append under an exclusive
+  file lock, and a row is only indexed after its vector is on disk.
+
+Files per model/backend (under EMBEDDING_CACHE_DIR):
+    <namespace>.f32      raw float32 vectors, one row per entry
+    <namespace>.sqlite   key -> row index, plus the vector dimension
+    <namespace>.lock     writer lock
+
+Usage:
+    cache = get_embedding_cache()
+    vectors = cache.encode(texts, encode_fn, prefix="passage: ")
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import EMBEDDING_BACKEND, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_ENABLED, EMBEDDING_MODEL_NAME
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+# SQLite limits the number of host parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+def cache_key(prefix: str, text: str) -> str:
+    """Content hash of one cache entry (the model is part of the cache file name)."""
+    return hashlib.sha256(f"{prefix}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Append-only embedding store for one model/backend."""
+
+    def __init__(self, cache_dir: str, model_name: str, backend: str) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        namespace = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}@{backend}")
+        self.vectors_path = os.path.join(cache_dir, f"{namespace}.f32")
+        self.index_path = os.path.join(cache_dir, f"{namespace}.sqlite")
+        self.lock_path = os.path.join(cache_dir, f"{namespace}.lock")
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Vector dimension, known once the first vector is stored."""
+        if self._dim is None:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            if row is not None:
+                self._dim = int(row[0])
+        return self._dim
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Exclusive across threads of this process and, with fcntl, across processes."""
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _mapped_vectors(self, needed_rows: int) -> np.memmap:
+        """Memory map of the vector file, re-mapped when other writers appended rows."""
+        if self._vectors is None or self._vectors.shape[0] < needed_rows:
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._vectors
+
+    def _lookup_rows(self, keys: Sequence[str]) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+            batch = list(keys[start:start + _LOOKUP_BATCH_SIZE])
+            placeholders = ",".join("?" * len(batch))
+            rows.update(
+                self._db.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+            )
+        return rows
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return {key: vector} for the keys that are cached."""
+        with self._lock:
+            rows = self._lookup_rows(keys)
+            if not rows:
+                return {}
+            vectors = self._mapped_vectors(max(rows.values()) + 1)
+            return {key: np.array(vectors[row]) for key, row in rows.items()}
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        """Append vectors for keys that are not cached yet."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+
+        with self._write_lock():
+            dim = self.dim
+            if dim is None:
+                dim = int(vectors.shape[1])
+                self._db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+                self._db.commit()
+                self._dim = dim
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache dimension {dim}.")
+
+            # Another process may have stored some of these keys meanwhile
+            known = self._lookup_rows(keys)
+            new = [(key, i) for i, key in enumerate(keys) if key not in known]
+            if not new:
+                return
+
+            # Vectors first, index second: readers never see a row that is not on disk
+            row_bytes = 4 * dim
+            with open(self.vectors_path, "ab") as file:
+                size = file.seek(0, os.SEEK_END)
+                if size % row_bytes:  # torn write of an interrupted writer
+                    size -= size % row_bytes
+                    file.truncate(size)
+                first_row = size // row_bytes
+                file.write(vectors[[i for _, i in new]].tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+            self._db.executemany(
+                "INSERT OR IGNORE INTO entries (key, row) VALUES (?, ?)",
+                [(key, first_row + n) for n, (key, _) in enumerate(new)],
+            )
+            self._db.commit()
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        prefix: str = "",
+    ) -> np.ndarray:
+        """
+        Return embeddings of `prefix + text` for every text, in order.
+
+        Only texts that are not cached yet are passed to `encode_fn` (once per
+        distinct text, already prefixed); their vectors are then stored.
+        """
+        keys = [cache_key(prefix, text) for text in texts]
+        cached = self.get_many(keys)
+        hits = sum(1 for key in keys if key in cached)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = f"{prefix}{text}"
+
+        if missing:
+            new_vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self.put_many(list(missing), new_vectors)
+            cached.update(zip(missing, new_vectors))
+
+        print(f"[INFO] Embedding cache: {hits} hits, {len(missing)} encoded.")
+        if not keys:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack([cached[key] for key in keys])
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(backend: str = EMBEDDING_BACKEND) -> Optional[EmbeddingCache]:
+    """
+    Return the shared cache for EMBEDDING_MODEL_NAME and `backend`,
+    or None when EMBEDDING_CACHE_ENABLED is off.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        if backend not in _caches:
+            _caches[backend] = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_NAME, backend)
+        return _caches[backend]
@@ -0,0 +1,228 @@
+# faq_index.py
+
+"""
+Offline job that builds the precomputed FAQ answer index.
+
+Responsibilities:
+- Mine chat_logs.jsonl for frequent question clusters (embedding similarity).
+- Precompute a grounded answer for each cluster through generate_answer.
+- Store the answer with the chunk ids it depends on in the FAQ collection.
+- Regenerate entries whose source chunks changed in the last ingest.
+
+At query time rag_core.lookup_faq_answer returns the stored answer when a
+question is close enough to a FAQ question.
+
+Usage:
+    python faq_index.py build --min-count 3 --max-entries 50
+    python faq_index.py refresh
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import DEFAULT_CORPUS, get_collection, get_faq_collection
+from conversation_logger import LOG_PATH
+from rag_core import embed_queries, generate_answer
+
+# Minimum cosine similarity for two logged questions to fall into the same cluster
+CLUSTER_SIMILARITY = 0.92
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace so trivial variants count as one question."""
+    return " ".join(question.lower().split())
+
+
+def load_logged_questions(log_path: Path = LOG_PATH, corpus: Optional[str] = None) -> List[str]:
+    """
+    Read every logged question for `corpus` from the chat log (JSONL).
+    Entries logged without a corpus belong to DEFAULT_CORPUS.
+    """
+    corpus = corpus or DEFAULT_CORPUS
+    questions: List[str] = []
+    try:
+        with log_path.open("r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if (entry.get("corpus") or DEFAULT_CORPUS) != corpus:
+                    continue
+                question = entry.get("question")
+                if question:
+                    questions.append(question)
+    except FileNotFoundError:
+        print(f"[INFO] Log file '{log_path}' does not exist yet.")
+    return questions
+
+
+def mine_faq_clusters(
+    questions: List[str],
+    min_count: int = 3,
+    max_entries: int = 50,
+    similarity: float = CLUSTER_SIMILARITY,
+) -> List[Dict]:
+    """
+    Group logged questions into clusters of near-duplicates.
+
+    Greedy clustering over unique questions, most frequent first: a question
+    joins the most similar cluster if its representative has cosine
+    similarity >= `similarity`, otherwise it starts a new cluster. The most frequent
+    question of a cluster is its representative.
+
+    Returns up to `max_entries` clusters with at least `min_count` questions,
+    most frequent first: [{"question", "count", "vector"}, ...].
+    """
+    counts: Dict[str, int] = {}
+    originals: Dict[str, str] = {}
+    for question in questions:
+        key = normalize_question(question)
+        counts[key] = counts.get(key, 0) + 1
+        originals.setdefault(key, question.strip())
+
+    if not counts:
+        return []
+
+    keys = sorted(counts, key=lambda k: counts[k], reverse=True)
+    vectors = np.asarray(embed_queries([originals[k] for k in keys]), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    clusters: List[Dict] = []
+    representatives: List[np.ndarray] = []
+    for key, vector in zip(keys, vectors):
+        if representatives:
+            scores = np.stack(representatives) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= similarity:
+                clusters[best]["count"] += counts[key]
+                continue
+        clusters.append({"question": originals[key], "count": counts[key], "vector": vector})
+        representatives.append(vector)
+
+    frequent = [c for c in clusters if c["count"] >= min_count]
+    frequent.sort(key=lambda c: c["count"], reverse=True)
+    return frequent[:max_entries]
+
+
+def faq_entry_id(question: str) -> str:
+    """Stable FAQ entry id derived from the normalized representative question."""
+    return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()[:16]
+
+
+def store_faq_entry(
+    question: str,
+    vector: List[float],
+    count: int,
+    corpus: Optional[str] = None,
+) -> None:
+    """
+    Generate a grounded answer for `question` and upsert it into the corpus' FAQ collection.
+    If the retrieval confidence gate rejects the question, its entry is deleted instead.
+    """
+    result = generate_answer(question, use_faq=False, corpus=corpus)
+    if result.get("gated"):
+        # An older answer may be grounded on chunks that no longer exist
+        print(f"[INFO] Removing FAQ entry below the retrieval confidence gate: {question}")
+        get_faq_collection(corpus).delete(ids=[faq_entry_id(question)])
+        return
+    get_faq_collection(corpus).upsert(
+        ids=[faq_entry_id(question)],
+        documents=[question],
+        embeddings=[[float(x) for x in vector]],
+        metadatas=[
+            {
+                "answer": result["answer"],
+                "sources": json.dumps(result["sources"], ensure_ascii=False),
+                "citations": json.dumps(result["citations"]),
+                "chunk_ids": json.dumps(result["chunk_ids"]),
+                "count": count,
+                "generated_at": datetime.utcnow().isoformat(),
+            }
+        ],
+    )
+
+
+def build_faq_index(min_count: int = 3, max_entries: int = 50, corpus: Optional[str] = None) -> int:
+    """
+    Mine the chat log and (re)build the FAQ index of `corpus`.
+
+    Entries that are no longer frequent are removed. Returns the number of entries.
+    """
+    clusters = mine_faq_clusters(
+        load_logged_questions(corpus=corpus), min_count=min_count, max_entries=max_entries
+    )
+    print(f"Found {len(clusters)} frequent question clusters.")
+
+    faq_collection = get_faq_collection(corpus)
+    keep_ids = {faq_entry_id(c["question"]) for c in clusters}
+    obsolete = [i for i in faq_collection.get(include=[])["ids"] if i not in keep_ids]
+    if obsolete:
+        faq_collection.delete(ids=obsolete)
+
+    for index, cluster in enumerate(clusters, start=1):
+        print(f"[{index}/{len(clusters)}] ({cluster['count']}x) {cluster['question']}")
+        store_faq_entry(cluster["question"], cluster["vector"].tolist(), cluster["count"], corpus=corpus)
+
+    return len(clusters)
+
+
+def refresh_stale_entries(corpus: Optional[str] = None) -> int:
+    """
+    Regenerate FAQ entries whose source chunks are no longer in the corpus' active collection.
+
+    Chunk ids are content hashes, so any chunk that changed in the last ingest
+    has disappeared under its old id. Returns the number of refreshed entries.
+    """
+    faq_collection = get_faq_collection(corpus)
+    entries = faq_collection.get(include=["documents", "metadatas", "embeddings"])
+    if not entries["ids"]:
+        return 0
+
+    chunk_ids_per_entry = [json.loads(meta["chunk_ids"]) for meta in entries["metadatas"]]
+    all_chunk_ids = sorted({cid for ids in chunk_ids_per_entry for cid in ids})
+    active = get_collection(corpus)
+    existing = set(active.get(ids=all_chunk_ids, include=[])["ids"]) if all_chunk_ids else set()
+
+    refreshed = 0
+    for question, meta, vector, chunk_ids in zip(
+        entries["documents"], entries["metadatas"], entries["embeddings"], chunk_ids_per_entry
+    ):
+        if all(cid in existing for cid in chunk_ids):
+            continue
+        print(f"Refreshing stale FAQ entry: {question}")
+        store_faq_entry(question, [float(x) for x in vector], meta.get("count", 0), corpus=corpus)
+        refreshed += 1
+
+    print(f"Refreshed {refreshed} of {len(entries['ids'])} FAQ entries.")
+    return refreshed
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Build or refresh the FAQ answer index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Mine the chat log and precompute answers.")
+    build.add_argument("--min-count", type=int, default=3)
+    build.add_argument("--max-entries", type=int, default=50)
+    build.add_argument("--corpus", default=DEFAULT_CORPUS)
+
+    refresh = subparsers.add_parser("refresh", help="Regenerate entries whose source chunks changed.")
+    refresh.add_argument("--corpus", default=DEFAULT_CORPUS)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_faq_index(min_count=args.min_count, max_entries=args.max_entries, corpus=args.corpus)
+    else:
+        refresh_stale_entries(corpus=args.corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,17 +8,45 @@ This script:
 - Reads markdown files and converts them to plain text
 - Chunks the text into smaller passages
 - Encodes them using the embedding model
-- Stores the results in a ChromaDB collection
+- Stores the results in a new versioned ChromaDB collection, validates it,
+  and switches the corpus alias to it (zero-downtime rebuild)
+
+Chunk ids are content hashes, so a rebuild only embeds new or changed chunks
+and copies the embeddings of unchanged ones from the active collection, as
+long as that collection was built with the same model and embedding backend
+(recorded in the collection metadata).
+Passages are also looked up in the on-disk embedding cache (embedding_cache.py),
+so re-chunking only encodes text that was never embedded before.
 """
 
+import argparse
+import hashlib
 import os
-import uuid
-from typing import List
+from typing import Dict, List, Tuple
 
 import markdown
 from bs4 import BeautifulSoup
 
-from config import PAGES_DIR, collection, embedding_model
+from config import (
+    DEFAULT_CORPUS,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    PAGES_DIR,
+    get_chroma_client,
+    get_collection,
+    get_embedding_model,
+)
+from corpus_registry import corpus_exists, garbage_collect, new_version_name, set_alias
+from embedding_cache import get_embedding_cache
+from snapshot import export_snapshot
+
+# Chunks written to Chroma per add() call
+ADD_BATCH_SIZE = 1000
+
+
+def embedding_signature() -> Dict[str, str]:
+    """Collection metadata naming the model and backend that produced its vectors."""
+    return {"embedding_model": EMBEDDING_MODEL_NAME, "embedding_backend": EMBEDDING_BACKEND}
 
 
 def read_markdown_file(path: str) -> str:
@@ -66,27 +94,31 @@ def simple_chunk_text(text: str, max_chars: int = 1200) -> List[str]:
     return chunks
 
 
-def ingest_pages() -> None:
+def make_chunk_id(rel_path: str, chunk: str) -> str:
+    """
+    Content-addressed chunk id: the same file + text always gets the same id,
+    so a changed chunk gets a new id and unchanged chunks keep theirs.
     """
-    Ingest all markdown files under PAGES_DIR into the Chroma collection.
+    return hashlib.sha1(f"{rel_path}\n{chunk}".encode("utf-8")).hexdigest()
 
-    Steps:
-        1. Walk through PAGES_DIR and find all .md files.
-        2. Read and chunk each file into smaller passages.
-        3. Encode each passage using the embedding model.
-        4. Store ids, documents, metadata, and embeddings in ChromaDB.
+
+def collect_chunks(pages_dir: str) -> Tuple[List[str], List[str], List[dict]]:
+    """
+    Read and chunk every .md file under pages_dir.
+    Returns (ids, texts, metadatas); identical chunks within a file are kept once.
     """
     all_texts: List[str] = []
     all_metadatas: List[dict] = []
     all_ids: List[str] = []
+    seen_ids = set()
 
-    for root, _, files in os.walk(PAGES_DIR):
+    for root, _, files in os.walk(pages_dir):
         for fname in files:
             if not fname.endswith(".md"):
                 continue
 
             file_path = os.path.join(root, fname)
-            rel_path = os.path.relpath(file_path, PAGES_DIR)
+            rel_path = os.path.relpath(file_path, pages_dir)
 
             print(f"Processing file: {rel_path}")
 
@@ -94,7 +126,11 @@ def ingest_pages() -> None:
             chunks = simple_chunk_text(text)
 
             for chunk in chunks:
-                doc_id = str(uuid.uuid4())
+                doc_id = make_chunk_id(rel_path, chunk)
+                if doc_id in seen_ids:
+                    # Identical chunk repeated in the same file
+                    continue
+                seen_ids.add(doc_id)
                 metadata = {
                     "source_file": rel_path,
                     "title": fname.replace(".md", ""),
@@ -104,36 +140,163 @@ def ingest_pages() -> None:
                 all_texts.append(chunk)
                 all_metadatas.append(metadata)
 
-    print(f"Total chunks to ingest: {len(all_texts)}")
-    print("Encoding embeddings with intfloat/multilingual-e5-small...")
-
-    # Recommended for E5 models:
-    # Documents should be prefixed with "passage: "
-    doc_inputs = [f"passage: {text}" for text in all_texts]
-
-    embeddings = embedding_model.encode(
-        doc_inputs,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-    ).tolist()
-
-    print("Saving embeddings and documents to ChromaDB...")
-    collection.add(
-        ids=all_ids,
-        documents=all_texts,
-        metadatas=all_metadatas,
-        embeddings=embeddings,
-    )
+    return all_ids, all_texts, all_metadatas
 
-    print("Ingestion completed.")
 
+def validate_collection(collection, expected_ids: List[str], samples: int = 5) -> None:
+    """
+    Check a freshly built collection before it goes live.
 
-if __name__ == "__main__":
-    ingest_pages()
+    - It must contain exactly the expected number of chunks.
+    - A few sampled chunks must find themselves (distance ~0) as nearest neighbour.
+    Raises RuntimeError on failure.
+    """
+    count = collection.count()
+    if count != len(expected_ids) or count == 0:
+        raise RuntimeError(f"Expected {len(expected_ids)} chunks, found {count}.")
+
+    step = max(1, len(expected_ids) // samples)
+    sample_ids = expected_ids[::step][:samples]
+    sample = collection.get(ids=sample_ids, include=["embeddings"])
+    results = collection.query(
+        query_embeddings=[[float(x) for x in e] for e in sample["embeddings"]],
+        n_results=1,
+        include=["distances"],
+    )
+    for doc_id, distances in zip(sample["ids"], results["distances"]):
+        if not distances or distances[0] > 1e-3:
+            raise RuntimeError(f"Chunk {doc_id} is not retrievable by its own embedding.")
 
 
+def ingest_pages(
+    corpus: str = DEFAULT_CORPUS,
+    pages_dir: str = PAGES_DIR,
+    refresh_faq: bool = True,
+) -> str:
+    """
+    Build a new version of `corpus` from the markdown files under pages_dir.
 
+    Steps:
+        1. Walk through pages_dir and find all .md files.
+        2. Read and chunk each file into smaller passages.
+        3. Reuse embeddings of chunks already in the active collection (if it
+           was built with the current model and backend) and encode only the
+           new passages.
+        4. Write everything into a new versioned collection, validate it and
+           export its memory-mapped snapshot (see snapshot.py).
+        5. Switch the corpus alias to the new collection (the running API picks
+           it up on its next request) and garbage-collect old versions.
+        6. Regenerate FAQ answers whose source chunks changed (if refresh_faq).
+
+    Returns the name of the new collection.
+    """
+    all_ids, all_texts, all_metadatas = collect_chunks(pages_dir)
+    if not all_ids:
+        raise RuntimeError(f"No markdown chunks found under {pages_dir}.")
+
+    # Embeddings of unchanged chunks are copied from the active collection
+    previous_ids: set = set()
+    reused: Dict[str, List[float]] = {}
+    if corpus_exists(corpus):
+        active = get_collection(corpus)
+        previous_ids = set(active.get(include=[])["ids"])
+        known = [doc_id for doc_id in all_ids if doc_id in previous_ids]
+        signature = embedding_signature()
+        active_signature = {key: (active.metadata or {}).get(key) for key in signature}
+        if known and active_signature != signature:
+            # Vectors of another backend must not be mixed with new query vectors;
+            # the embedding cache still avoids encoding texts seen with this backend
+            print(
+                f"[INFO] Active collection was embedded with {active_signature}, not {signature}; "
+                "re-embedding all chunks."
+            )
+            known = []
+        if known:
+            # Chroma and snapshots return numpy rows; add() only accepts plain floats
+            existing = active.get(ids=known, include=["embeddings"])
+            reused = {doc_id: [float(x) for x in e] for doc_id, e in zip(existing["ids"], existing["embeddings"])}
+
+    removed_ids = previous_ids - set(all_ids)
+    missing = [i for i, doc_id in enumerate(all_ids) if doc_id not in reused]
+    print(
+        f"Total chunks: {len(all_ids)} ({len(missing)} to encode, "
+        f"{len(reused)} reused, {len(removed_ids)} removed)"
+    )
 
+    embeddings: List[List[float]] = [reused.get(doc_id) for doc_id in all_ids]
+    if missing:
+        print("Encoding embeddings with intfloat/multilingual-e5-small...")
+
+        def encode(doc_inputs: List[str]):
+            return get_embedding_model().encode(
+                doc_inputs,
+                show_progress_bar=True,
+                convert_to_numpy=True,
+            )
+
+        # Recommended for E5 models:
+        # Documents should be prefixed with "passage: "
+        texts = [all_texts[i] for i in missing]
+        cache = get_embedding_cache()
+        if cache is not None:
+            new_embeddings = cache.encode(texts, encode, prefix="passage: ").tolist()
+        else:
+            new_embeddings = encode([f"passage: {text}" for text in texts]).tolist()
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
+
+    collection_name = new_version_name(corpus)
+    print(f"Saving embeddings and documents to ChromaDB collection '{collection_name}'...")
+    collection = get_chroma_client().create_collection(
+        name=collection_name,
+        metadata={
+            "description": f"Markdown chunks of corpus '{corpus}' processed with E5 embeddings",
+            **embedding_signature(),
+        },
+    )
+    try:
+        for start in range(0, len(all_ids), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            collection.add(
+                ids=all_ids[start:end],
+                documents=all_texts[start:end],
+                metadatas=all_metadatas[start:end],
+                embeddings=embeddings[start:end],
+            )
+        validate_collection(collection, all_ids)
+    except Exception:
+        print(f"[ERROR] Build of '{collection_name}' failed; the active index is unchanged.")
+        get_chroma_client().delete_collection(collection_name)
+        raise
+
+    try:
+        export_snapshot(collection)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[WARN] Could not write the snapshot of '{collection_name}': {exc}")
+
+    set_alias(corpus, collection_name)
+    garbage_collect(corpus)
+    print("Ingestion completed.")
+
+    if refresh_faq and removed_ids:
+        from faq_index import refresh_stale_entries
 
+        try:
+            refresh_stale_entries(corpus=corpus)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[WARN] Could not refresh FAQ answers: {exc}")
 
+    return collection_name
 
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest markdown pages into a versioned ChromaDB collection.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Corpus name (e.g. handbook, hr, it).")
+    parser.add_argument("--pages-dir", default=PAGES_DIR, help="Directory of markdown files for the corpus.")
+    parser.add_argument(
+        "--no-faq-refresh",
+        action="store_true",
+        help="Do not regenerate FAQ answers whose source chunks changed.",
+    )
+    args = parser.parse_args()
+    ingest_pages(corpus=args.corpus, pages_dir=args.pages_dir, refresh_faq=not args.no_faq_refresh)
@@ -0,0 +1,205 @@
+# language.py
+
+"""
+Lightweight, local language handling for user questions.
+
+Responsibilities:
+- Detect whether a question is Vietnamese or English (no model, no network).
+- Translate frequent Vietnamese HR / IT terms into English keywords with a
+  small glossary, so retrieval can also search the English handbook with an
+  English query.
+
+Both functions are memoized, so repeated traffic costs a dictionary lookup.
+
+Usage:
+    python language.py      # check detect_language on known tricky questions
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from config import LANGUAGE_CACHE_SIZE
+
+# Letters that only occur in Vietnamese (after lowercasing)
+VIETNAMESE_CHARS = set(
+    "ăâđêôơư"
+    "àáảãạằắẳẵặầấẩẫậ"
+    "èéẻẽẹềếểễệ"
+    "ìíỉĩị"
+    "òóỏõọồốổỗộờớởỡợ"
+    "ùúủũụừứửữự"
+    "ỳýỷỹỵ"
+)
+# Accented letters that also appear in English loanwords ("café", "résumé")
+SHARED_ACCENTED_CHARS = set("àáâãèéêìíòóôõùúý")
+
+# Common Vietnamese words, compared without diacritics
+VIETNAMESE_PLAIN_WORDS = {
+    "toi", "ban", "la", "gi", "khong", "co", "cua", "cho", "nhu", "the", "nao",
+    "lam", "sao", "duoc", "nhung", "voi", "trong", "nay", "khi", "bao", "nhieu",
+    "o", "dau", "va", "cac", "nhan", "vien", "chinh", "sach", "nghi", "phep",
+}
+# Plain words that are also English words or prefixes ("the", "co-op"); they
+# only count as Vietnamese when written with their diacritics
+ENGLISH_COLLISIONS = {"the", "ban", "co", "o", "la"}
+
+# Frequent Vietnamese terms -> English handbook vocabulary
+VI_EN_GLOSSARY = {
+    "nghỉ phép": "leave",
+    "nghỉ ốm": "sick leave",
+    "nghỉ thai sản": "parental leave",
+    "nghỉ lễ": "holiday",
+    "ngày lễ": "holiday",
+    "làm thêm giờ": "overtime",
+    "làm việc từ xa": "remote work telework",
+    "lịch làm việc": "work schedule",
+    "giờ làm việc": "working hours",
+    "chấm công": "timecard timesheet",
+    "lương": "salary pay",
+    "bảo hiểm": "insurance",
+    "phúc lợi": "benefits",
+    "tuyển dụng": "hiring",
+    "phỏng vấn": "interview",
+    "thăng chức": "promotion",
+    "thăng tiến": "promotion career progression",
+    "đánh giá hiệu suất": "performance review",
+    "đánh giá": "review evaluation",
+    "đào tạo": "training",
+    "hội thảo": "conference",
+    "công tác": "travel",
+    "đi công tác": "business travel",
+    "hoàn tiền": "reimbursement",
+    "hoàn ứng": "reimbursement",
+    "nhân viên mới": "new employee onboarding",
+    "nhân viên": "employee staff",
+    "nhân sự": "human resources HR",
+    "quản lý": "manager supervisor",
+    "hợp đồng": "contract",
+    "nhà thầu": "contractor",
+    "mua sắm": "procurement purchase",
+    "mua phần mềm": "software purchase request",
+    "phần mềm": "software",
+    "thiết bị": "equipment",
+    "máy tính": "laptop computer",
+    "máy in": "printer",
+    "mật khẩu": "password",
+    "tài khoản": "account",
+    "đăng nhập": "login sign in",
+    "bảo mật": "security",
+    "sự cố bảo mật": "security incident",
+    "quyền riêng tư": "privacy",
+    "cuộc họp": "meeting",
+    "lịch": "calendar",
+    "xung đột": "conflict",
+    "phản hồi": "feedback",
+    "quy tắc ứng xử": "code of conduct",
+    "nghỉ việc": "offboarding leaving",
+    "chính sách": "policy",
+    "quy trình": "process",
+    "hướng dẫn": "guide instructions",
+    "hỗ trợ": "support help",
+    "cài đặt": "install setup",
+    "là gì": "what is",
+    "như thế nào": "how",
+    "làm thế nào": "how to",
+    "ở đâu": "where",
+    "khi nào": "when",
+    "bao nhiêu": "how many",
+}
+
+# Longest terms first, so "nghỉ thai sản" wins over shorter overlapping terms
+_GLOSSARY_RE = re.compile(
+    r"(?<!\w)("
+    + "|".join(re.escape(term) for term in sorted(VI_EN_GLOSSARY, key=len, reverse=True))
+    + r")(?!\w)"
+)
+
+
+def _strip_diacritics(word: str) -> str:
+    decomposed = unicodedata.normalize("NFD", word.replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def detect_language(text: str) -> str:
+    """
+    Return "vi" for Vietnamese text, otherwise "en".
+
+    Vietnamese is detected by a Vietnamese-only letter (ư, ơ, đ, ạ, ...), by
+    an accented word that is a common Vietnamese word ("tôi", "có", "là"),
+    or, for text typed without diacritics, by several common Vietnamese words.
+    Accents shared with English loanwords ("café", "résumé") alone are not enough.
+    Input is normalized to NFC first (macOS / iOS often send decomposed text).
+    """
+    lowered = unicodedata.normalize("NFC", text).lower()
+    if any(ch in VIETNAMESE_CHARS and ch not in SHARED_ACCENTED_CHARS for ch in lowered):
+        return "vi"
+
+    words = re.findall(r"\w+", lowered)
+    if any(
+        _strip_diacritics(word) in VIETNAMESE_PLAIN_WORDS
+        for word in words
+        if any(ch in SHARED_ACCENTED_CHARS for ch in word)
+    ):
+        return "vi"
+
+    plain_words = [word for word in words if word.isascii() and word.isalpha()]
+    plain_hits = sum(
+        1 for word in plain_words if word in VIETNAMESE_PLAIN_WORDS and word not in ENGLISH_COLLISIONS
+    )
+    if plain_words and plain_hits >= 3 and plain_hits / len(plain_words) >= 0.4:
+        return "vi"
+    return "en"
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def translate_query(text: str) -> Optional[str]:
+    """
+    Build an English keyword query from the glossary terms found in `text`.
+
+    Latin-script tokens (e.g. "Slack", "GitHub", "PIV") are kept as they are.
+    Returns None when no glossary term matches.
+    """
+    lowered = unicodedata.normalize("NFC", text).lower()
+    terms = [VI_EN_GLOSSARY[match] for match in _GLOSSARY_RE.findall(lowered)]
+    if not terms:
+        return None
+
+    kept = []
+    for token in _GLOSSARY_RE.sub(" ", lowered).split():
+        token = token.strip("?.,!:;()[]\"'")
+        if re.fullmatch(r"[a-z0-9][a-z0-9\-]+", token) and token not in VIETNAMESE_PLAIN_WORDS:
+            kept.append(token)
+    return " ".join(terms + kept)
+
+
+# Known tricky questions and their expected language
+DETECTION_CASES: List[Tuple[str, str]] = [
+    ("Is the ban on the VPN in the office?", "en"),
+    ("What is the ban on the co-op?", "en"),
+    ("The the the policy", "en"),
+    ("I had a café with my résumé", "en"),
+    ("Chính sách nghỉ phép là gì?", "vi"),
+    (unicodedata.normalize("NFD", "Chính sách nghỉ phép là gì?"), "vi"),
+    ("Có được làm việc từ xa không?", "vi"),
+    ("toi muon biet chinh sach nghi phep", "vi"),
+    ("lam sao de xin nghi phep", "vi"),
+]
+
+
+def check_detection() -> int:
+    """Run detect_language on DETECTION_CASES, print mismatches and return their number."""
+    failures = 0
+    for text, expected in DETECTION_CASES:
+        detected = detect_language(text)
+        if detected != expected:
+            failures += 1
+            print(f"[WARN] detect_language({text!r}) = {detected!r}, expected {expected!r}")
+    print(f"[INFO] {len(DETECTION_CASES) - failures}/{len(DETECTION_CASES)} language detection cases passed.")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if check_detection() else 0)
@@ -0,0 +1,282 @@
+# llm_provider.py
+
+"""
+LLM provider layer for the RAG system.
+
+Responsibilities:
+- Define a common interface for text generation (LLMProvider.generate).
+- Retry transient failures with exponential backoff and full jitter.
+- Stop calling a failing upstream through a circuit breaker.
+- Coalesce identical in-flight prompts so concurrent identical questions
+  trigger a single upstream call.
+
+Providers:
+- GeminiProvider: Google Gemini, reusing the shared client from config
+  (one pooled HTTP connection, request timeout from LLM_TIMEOUT_SECONDS).
+- StubProvider: deterministic local stand-in for offline and load testing.
+
+Select the provider with LLM_PROVIDER=gemini|stub.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from config import (
+    GEN_MODEL,
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_PROVIDER,
+    STUB_LLM_LATENCY_MS,
+    get_client,
+)
+
+
+# Upstream status codes worth retrying (and counting against the circuit breaker)
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+@lru_cache(maxsize=1)
+def _transient_exception_types() -> Tuple[type, ...]:
+    """Network-level exceptions that are worth retrying."""
+    types = [TimeoutError, ConnectionError]
+    try:
+        import httpx  # transport of google-genai: timeouts, connection and protocol errors
+
+        types.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(types)
+
+
+class LLMError(RuntimeError):
+    """Raised when the LLM provider cannot produce an answer."""
+
+
+class CircuitOpenError(LLMError):
+    """Raised when the circuit breaker rejects a call without contacting upstream."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    - closed:    calls go through; failures are counted.
+    - open:      after `failure_threshold` consecutive failures, calls are
+                 rejected for `reset_seconds`.
+    - half-open: after the cooldown, one trial call is allowed; success closes
+                 the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not be attempted."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_progress:
+                raise CircuitOpenError("LLM circuit breaker is open; upstream calls are paused.")
+            self._trial_in_progress = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def release_trial(self) -> None:
+        """End a half-open trial call that says nothing about upstream health."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+class LLMProvider(ABC):
+    """
+    Base class for LLM providers.
+
+    Subclasses implement `_call(prompt, model)`; `generate` adds request
+    coalescing, retries with jitter and the circuit breaker on top.
+    """
+
+    name = "base"
+
+    def __init__(
+        self,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(
+            LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS
+        )
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def generate(self, prompt: str, model: str = GEN_MODEL) -> str:
+        """
+        Generate text for `prompt`.
+
+        If the same (model, prompt) is already being generated by another
+        thread, wait for that result instead of calling upstream again.
+        """
+        key = (model, prompt)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            text = self._generate_with_retries(prompt, model)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(text)
+            return text
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _generate_with_retries(self, prompt: str, model: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            try:
+                text = self._call(prompt, model)
+            except Exception as exc:  # noqa: BLE001
+                if not self._is_retryable(exc):
+                    # Client errors (invalid or blocked prompt, auth) and bugs are not
+                    # upstream outages: fail this call only, leave the breaker alone
+                    self.breaker.release_trial()
+                    if isinstance(getattr(exc, "code", None), int):
+                        raise LLMError(f"{self.name} generation failed: {exc}") from exc
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise LLMError(f"{self.name} generation failed: {exc}") from exc
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                print(f"[WARN] {self.name} call failed ({exc}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return text
+        raise LLMError(f"{self.name} generation failed")
+
+    def _is_retryable(self, exc: Exception) -> bool:
+        """
+        Retry only transient failures: RETRYABLE_STATUS_CODES (rate limits,
+        server errors, timeouts) and network errors. Everything else fails at once.
+        """
+        code = getattr(exc, "code", None)
+        if isinstance(code, int):
+            return code in RETRYABLE_STATUS_CODES
+        return isinstance(exc, _transient_exception_types())
+
+    @abstractmethod
+    def _call(self, prompt: str, model: str) -> str:
+        """Send one generation request to the backend and return the text."""
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini provider using the shared, connection-pooled client."""
+
+    name = "gemini"
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.client = get_client()
+
+    def _call(self, prompt: str, model: str) -> str:
+        response = self.client.models.generate_content(
+            model=model,
+            contents=prompt,
+        )
+        return response.text or ""
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic local provider.
+
+    Returns the first sentence of the first CONTEXT snippet in the prompt (or
+    a digest of the prompt), after an optional simulated latency. Use it to run
+    the whole pipeline and load tests without network access.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = STUB_LLM_LATENCY_MS, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.latency_ms = latency_ms
+
+    def _call(self, prompt: str, model: str) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        match = re.search(r"CONTEXT:\s*\[Source: [^\]]*\]\s*(.+?)(?:\n|$)", prompt)
+        if match:
+            sentence = re.split(r"(?<=[.!?])\s", match.group(1).strip(), maxsplit=1)[0]
+            return f"{sentence} (stub answer {digest})"
+        return f"Stub answer {digest}."
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_llm_provider() -> LLMProvider:
+    """Return the shared provider selected by LLM_PROVIDER, creating it on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if LLM_PROVIDER not in PROVIDERS:
+                    raise ValueError(
+                        f"Unknown LLM_PROVIDER '{LLM_PROVIDER}'. Choose one of: {', '.join(PROVIDERS)}"
+                    )
+                _provider = PROVIDERS[LLM_PROVIDER]()
+    return _provider
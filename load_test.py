@@ -0,0 +1,295 @@
+# load_test.py
+
+"""
+Load generator for the /chatbot_query + /chatbot_result flow.
+
+Each virtual user:
+- Splits a question into fragments and sends them to POST /chatbot_query
+  with realistic typing gaps between fragments.
+- Polls GET /chatbot_result/{user_id}/{chat_id} until the answer is ready.
+- Records end-to-end latency (last fragment sent -> answer received),
+  per-request HTTP latency and errors.
+
+Stages with increasing numbers of users are run one after another. After each
+stage the server-side metrics (/metrics) are collected, and the stage where
+throughput stops growing (or p99 exceeds the SLO) is reported as the
+saturation point.
+
+Typical setup (stub LLM, real local index, short compose window):
+    LLM_PROVIDER=stub STUB_LLM_LATENCY_MS=800 COMPOSE_WINDOW_SECONDS=2 uvicorn api:app --port 8000
+    python load_test.py --users 5,10,20,50 --questions-per-user 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from metrics import summarize
+
+QUESTIONS_FILE = "tts_questions.json"
+WAITING_MSG = "(Answer is not ready yet, or no complete question has been detected.)"
+ERROR_MSG = "(Sorry, something went wrong while generating the answer. Please try again.)"
+BUSY_MSG_PREFIX = "(The assistant is busy right now."
+
+FALLBACK_QUESTIONS = [
+    "What is the leave policy for employees?",
+    "How do I connect to the office Wi-Fi?",
+    "How does the hiring process at TTS generally work?",
+    "What should I do in my first week as a new employee?",
+    "Chính sách nghỉ phép cho nhân viên là gì?",
+    "Làm thế nào để yêu cầu mua phần mềm mới?",
+]
+
+
+@dataclass
+class StageResult:
+    """Measurements collected for one load stage."""
+    users: int
+    duration: float = 0.0
+    end_to_end: List[float] = field(default_factory=list)
+    post_latency: List[float] = field(default_factory=list)
+    poll_latency: List[float] = field(default_factory=list)
+    polls: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    server: Dict = field(default_factory=dict)
+
+    @property
+    def completed(self) -> int:
+        return len(self.end_to_end)
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.duration if self.duration else 0.0
+
+    def add_error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def load_questions() -> List[str]:
+    """Load benchmark questions from QUESTIONS_FILE, or use built-in samples."""
+    if os.path.exists(QUESTIONS_FILE):
+        with open(QUESTIONS_FILE, "r", encoding="utf-8") as file:
+            questions = [q for qs in json.load(file).values() for q in qs]
+        if questions:
+            return questions
+    return list(FALLBACK_QUESTIONS)
+
+
+def split_into_fragments(question: str, max_fragments: int) -> List[str]:
+    """Split a question into 1..max_fragments word-aligned fragments."""
+    words = question.split()
+    count = random.randint(1, max(1, min(max_fragments, len(words))))
+    size = -(-len(words) // count)  # ceil division
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+async def run_virtual_user(
+    client: httpx.AsyncClient,
+    user_index: int,
+    questions: List[str],
+    args: argparse.Namespace,
+    result: StageResult,
+) -> None:
+    """Send `args.questions_per_user` fragmented questions and wait for each answer."""
+    user_id = f"loadtest-user-{user_index}"
+    chat_id = str(uuid.uuid4())
+
+    for _ in range(args.questions_per_user):
+        fragments = split_into_fragments(random.choice(questions), args.max_fragments)
+
+        sent_last_fragment = False
+        for index, fragment in enumerate(fragments):
+            if index:
+                await asyncio.sleep(random.uniform(args.typing_gap_min, args.typing_gap_max))
+            started = time.perf_counter()
+            try:
+                resp = await client.post(
+                    "/chatbot_query",
+                    json={"user_id": user_id, "chat_id": chat_id, "question": fragment},
+                )
+            except httpx.HTTPError as exc:
+                result.add_error(f"post_{type(exc).__name__}")
+                break
+            result.post_latency.append(time.perf_counter() - started)
+            if resp.status_code == 503:
+                result.add_error("shed_busy")
+                await asyncio.sleep(float(resp.headers.get("Retry-After", "1")))
+                break
+            if resp.status_code != 200:
+                result.add_error(f"post_http_{resp.status_code}")
+                break
+            sent_last_fragment = index == len(fragments) - 1
+
+        if not sent_last_fragment:
+            await asyncio.sleep(args.think_time)
+            continue
+
+        last_fragment_at = time.perf_counter()
+        answer: Optional[str] = None
+        while time.perf_counter() - last_fragment_at < args.answer_timeout:
+            await asyncio.sleep(args.poll_interval)
+            started = time.perf_counter()
+            try:
+                resp = await client.get(f"/chatbot_result/{user_id}/{chat_id}")
+            except httpx.HTTPError as exc:
+                result.add_error(f"poll_{type(exc).__name__}")
+                continue
+            result.poll_latency.append(time.perf_counter() - started)
+            result.polls += 1
+            if resp.status_code != 200:
+                result.add_error(f"poll_http_{resp.status_code}")
+                continue
+            text = resp.json().get("answer", "")
+            if text.strip() != WAITING_MSG:
+                answer = text
+                break
+
+        if answer is None:
+            result.add_error("answer_timeout")
+        elif answer.strip() == ERROR_MSG:
+            result.add_error("answer_error")
+        elif answer.startswith(BUSY_MSG_PREFIX):
+            result.add_error("shed_busy")
+        else:
+            result.end_to_end.append(time.perf_counter() - last_fragment_at)
+
+        await asyncio.sleep(args.think_time)
+
+
+async def run_stage(users: int, questions: List[str], args: argparse.Namespace) -> StageResult:
+    """Run one stage with `users` concurrent virtual users."""
+    result = StageResult(users=users)
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.http_timeout, limits=limits) as client:
+        try:
+            await client.delete("/metrics")
+        except httpx.HTTPError:
+            pass
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(run_virtual_user(client, i, questions, args, result) for i in range(users))
+        )
+        result.duration = time.perf_counter() - started
+
+        try:
+            result.server = (await client.get("/metrics")).json()
+        except (httpx.HTTPError, ValueError):
+            result.server = {}
+    return result
+
+
+def print_stage(result: StageResult) -> None:
+    """Print a one-stage summary."""
+    e2e = summarize(result.end_to_end)
+    post = summarize(result.post_latency)
+    poll = summarize(result.poll_latency)
+    attempted = result.completed + result.error_count
+    error_rate = result.error_count / attempted if attempted else 0.0
+    pipeline = result.server.get("latencies", {}).get("answer_pipeline", {})
+    queue_wait = result.server.get("latencies", {}).get("answer_queue_wait", {})
+
+    print(f"\n=== {result.users} users: {result.completed} answers in {result.duration:.1f}s "
+          f"({result.throughput:.2f} answers/s), error rate {error_rate:.1%} ===")
+    print(f"  end-to-end  p50={e2e['p50_ms']:.0f} ms  p90={e2e['p90_ms']:.0f} ms  "
+          f"p99={e2e['p99_ms']:.0f} ms  max={e2e['max_ms']:.0f} ms")
+    print(f"  POST query  p50={post['p50_ms']:.1f} ms  p99={post['p99_ms']:.1f} ms")
+    print(f"  GET result  p50={poll['p50_ms']:.1f} ms  p99={poll['p99_ms']:.1f} ms  ({result.polls} polls)")
+    if pipeline:
+        print(f"  server answer_pipeline  p50={pipeline['p50_ms']:.0f} ms  p99={pipeline['p99_ms']:.0f} ms")
+    if queue_wait:
+        print(f"  server answer_queue_wait  p50={queue_wait['p50_ms']:.0f} ms  p99={queue_wait['p99_ms']:.0f} ms")
+    if result.errors:
+        print(f"  errors: {result.errors}")
+
+
+def find_saturation(results: List[StageResult], slo_p99: float) -> Optional[int]:
+    """
+    Return the user count at which the server saturated, or None.
+
+    A stage is saturated when throughput grows by less than 10% over the
+    previous stage, or when end-to-end p99 exceeds the SLO (seconds).
+    """
+    previous: Optional[StageResult] = None
+    for result in results:
+        p99_seconds = summarize(result.end_to_end)["p99_ms"] / 1000
+        if p99_seconds > slo_p99:
+            return result.users
+        if previous is not None and result.throughput < previous.throughput * 1.1:
+            return result.users
+        previous = result
+    return None
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    questions = load_questions()
+    stages = [int(u) for u in args.users.split(",") if u.strip()]
+    results: List[StageResult] = []
+
+    for users in stages:
+        print(f"\nRunning stage with {users} virtual users...")
+        result = await run_stage(users, questions, args)
+        print_stage(result)
+        results.append(result)
+
+    saturation = find_saturation(results, args.slo_p99)
+    print("\n" + "=" * 80)
+    if saturation is None:
+        print("No saturation detected; try larger stages.")
+    else:
+        print(f"Saturation reached at ~{saturation} concurrent users.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps({
+                    "users": result.users,
+                    "duration_s": result.duration,
+                    "answers": result.completed,
+                    "throughput": result.throughput,
+                    "errors": result.errors,
+                    "end_to_end": summarize(result.end_to_end),
+                    "post_latency": summarize(result.post_latency),
+                    "poll_latency": summarize(result.poll_latency),
+                    "server": result.server,
+                }, ensure_ascii=False) + "\n")
+        print(f"Stage results written to {args.output}")
+
+
+def main() -> None:
+    """Parse arguments and run the load test."""
+    parser = argparse.ArgumentParser(description="Load test the chatbot fragment/poll API.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", default="1,5,10,20", help="Comma-separated virtual users per stage.")
+    parser.add_argument("--questions-per-user", type=int, default=3)
+    parser.add_argument("--max-fragments", type=int, default=3)
+    parser.add_argument("--typing-gap-min", type=float, default=0.3,
+                        help="Seconds between fragments (keep below the server compose window).")
+    parser.add_argument("--typing-gap-max", type=float, default=1.5)
+    parser.add_argument("--think-time", type=float, default=1.0, help="Seconds between questions.")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--answer-timeout", type=float, default=120.0)
+    parser.add_argument("--http-timeout", type=float, default=30.0)
+    parser.add_argument("--slo-p99", type=float, default=30.0, help="End-to-end p99 SLO in seconds.")
+    parser.add_argument("--output", help="Optional JSONL file for per-stage results.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# metrics.py
+
+"""
+In-process metrics for the chatbot API.
+
+Responsibilities:
+- Record latency samples (seconds) per metric name and summarize them as percentiles.
+- Keep simple counters (e.g. answers, errors) and gauges (e.g. queue depth).
+- Produce a JSON-friendly snapshot for the /metrics endpoint.
+
+All operations are thread-safe, so they can be called from the event loop and
+from threadpool workers alike.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (pct in 0..100). Returns 0.0 for no samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) as count / mean / percentiles in milliseconds."""
+    count = len(samples)
+    return {
+        "count": count,
+        "mean_ms": round(sum(samples) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p90_ms": round(percentile(samples, 90) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if count else 0.0,
+    }
+
+
+class Metrics:
+    """
+    Thread-safe registry of latency histograms, counters and gauges.
+
+    Latency metrics keep the most recent `max_samples` samples each.
+    """
+
+    def __init__(self, max_samples: int = 10000) -> None:
+        self.max_samples = max_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one latency sample in seconds."""
+        with self._lock:
+            samples = self._latencies.get(name)
+            if samples is None:
+                samples = deque(maxlen=self.max_samples)
+                self._latencies[name] = samples
+            samples.append(seconds)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Increase a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set the current value of a gauge."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def samples(self, name: str) -> List[float]:
+        """Return a copy of the latency samples recorded under `name`."""
+        with self._lock:
+            return list(self._latencies.get(name, ()))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return counters, gauges and latency summaries as plain dicts."""
+        with self._lock:
+            latencies = {name: list(samples) for name, samples in self._latencies.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "latencies": {name: summarize(samples) for name, samples in latencies.items()},
+        }
+
+    def reset(self) -> None:
+        """Clear latency samples and counters (gauges describe current state and are kept)."""
+        with self._lock:
+            self._latencies.clear()
+            self._counters.clear()
+
+
+# Create a shared instance for the entire app
+metrics = Metrics()
@@ -4,65 +4,235 @@
 Core RAG logic module.
 Responsible for:
 - Embedding user queries
+- Optionally searching with an English glossary translation of Vietnamese
+  questions as well (dual-language retrieval)
+- Returning precomputed answers for frequent questions (FAQ index)
 - Retrieving relevant context from ChromaDB
+- Returning the fixed "not found" message without an LLM call when retrieval
+  confidence is too low (see retrieval_gate.py)
 - Constructing the final LLM prompt
-- Generating the final answer using Gemini
+- Generating the final answer through the configured LLM provider
+- Citing the chunks that support the answer (computed locally, see citations.py)
 """
 
-from typing import List, Dict, Optional
+import json
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 
-from config import collection, embedding_model, client, GEN_MODEL
+from config import (
+    DUAL_LANGUAGE_RETRIEVAL,
+    FAQ_ENABLED,
+    FAQ_MAX_DISTANCE,
+    GEN_MODEL,
+    LANGUAGE_CACHE_SIZE,
+    RETRIEVAL_GATE_ENABLED,
+    get_collection,
+    get_embedding_model,
+    get_faq_collection,
+)
+from citations import cite_answer
+from conversation_logger import log_gate_decision
+from language import detect_language, translate_query
+from llm_provider import get_llm_provider
+from retrieval_gate import retrieval_confidence
 
+# Fixed replies when the answer is not in the documentation, per question language
+NOT_FOUND_MESSAGES = {
+    "en": "I could not find the exact information in the internal documentation.",
+    "vi": "Tôi không tìm thấy thông tin chính xác trong tài liệu nội bộ.",
+}
 
-def embed_query(text: str) -> List[float]:
+
+def embed_queries(texts: List[str]) -> List[List[float]]:
     """
-    Embed the user's query using the e5-multilingual model.
+    Embed several user queries in one batched encode call.
 
     According to the e5 model guidelines:
     - Query inputs should be prefixed with: "query: "
     """
-    query_input = f"query: {text}"
-    vector = embedding_model.encode([query_input], convert_to_numpy=True)[0]
-    return vector.tolist()
+    query_inputs = [f"query: {text}" for text in texts]
+    vectors = get_embedding_model().encode(query_inputs, convert_to_numpy=True)
+    return vectors.tolist()
+
+
+def embed_query(text: str) -> List[float]:
+    """Embed a single user query (see embed_queries)."""
+    return embed_queries([text])[0]
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def embed_translated_query(translated: str) -> Tuple[float, ...]:
+    """
+    Embed a glossary translation (see language.translate_query), memoized.
+
+    Translations of frequent questions repeat a lot, so the second retrieval
+    query usually costs no encode call at all.
+    """
+    return tuple(embed_query(translated))
+
+
+def query_contexts(
+    query_vectors: List[List[float]],
+    top_k: int,
+    corpus: Optional[str] = None,
+) -> List[List[Dict]]:
+    """
+    Query the vector database of `corpus` with one or more query vectors at once.
+
+    Returns one list of contexts per query vector. Each context contains:
+    - id
+    - text
+    - metadata
+    - similarity score (Chroma distance, lower is closer)
+    - embedding (the stored chunk vector, reused for citations)
+    """
+    results = get_collection(corpus).query(
+        query_embeddings=query_vectors,
+        n_results=top_k,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
+
+    all_contexts = []
+    for ids, docs, metas, dists, vectors in zip(
+        results["ids"], results["documents"], results["metadatas"],
+        results["distances"], results["embeddings"],
+    ):
+        all_contexts.append(
+            [
+                {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": meta,
+                    "score": dist,
+                    "embedding": vector,
+                }
+                for doc_id, doc, meta, dist, vector in zip(ids, docs, metas, dists, vectors)
+            ]
+        )
+    return all_contexts
+
+
+def lookup_faq_answer(query_vector: List[float], corpus: Optional[str] = None) -> Optional[Dict]:
+    """
+    Return the precomputed answer of the closest FAQ entry, if it is close enough.
+
+    The FAQ collection is built offline by faq_index.py. A match requires a
+    cosine distance <= FAQ_MAX_DISTANCE between the question and the stored
+    FAQ question.
+    """
+    if not FAQ_ENABLED:
+        return None
+
+    faq_collection = get_faq_collection(corpus)
+    if faq_collection.count() == 0:
+        return None
+
+    results = faq_collection.query(
+        query_embeddings=[query_vector],
+        n_results=1,
+        include=["documents", "metadatas", "distances"],
+    )
+    if not results["ids"][0]:
+        return None
+
+    distance = results["distances"][0][0]
+    if distance > FAQ_MAX_DISTANCE:
+        return None
+
+    meta = results["metadatas"][0][0]
+    if meta is None:  # entry deleted by another process (faq_index.py)
+        return None
+    print(f"[DEBUG] FAQ hit: '{results['documents'][0][0]}' (distance {distance:.4f})")
+    return {
+        "answer": meta["answer"],
+        "sources": json.loads(meta["sources"]),
+        "citations": json.loads(meta.get("citations", "[]")),
+        "chunk_ids": json.loads(meta["chunk_ids"]),
+        "faq_id": results["ids"][0][0],
+    }
+
+
+def merge_contexts(context_lists: List[List[Dict]], top_k: int) -> List[Dict]:
+    """
+    Merge the results of several queries against the same collection.
 
+    Chunks found by more than one query keep their best (lowest) score.
+    Returns the top_k chunks, closest first.
+    """
+    best: Dict[str, Dict] = {}
+    for contexts in context_lists:
+        for ctx in contexts:
+            current = best.get(ctx["id"])
+            if current is None or ctx["score"] < current["score"]:
+                best[ctx["id"]] = ctx
+    return sorted(best.values(), key=lambda ctx: ctx["score"])[:top_k]
 
-def retrieve_context(question: str, top_k: int = 5) -> List[Dict]:
+
+def query_contexts_for_questions(
+    questions: List[str],
+    query_vectors: List[List[float]],
+    top_k: int,
+    corpus: Optional[str] = None,
+) -> List[List[Dict]]:
+    """
+    Like query_contexts, one list of contexts per question.
+
+    With DUAL_LANGUAGE_RETRIEVAL enabled, Vietnamese questions that contain
+    glossary terms are also searched with their (cached) English translation
+    in the same Chroma call, and both result lists are merged.
+    """
+    vectors = list(query_vectors)
+    extra_rows: Dict[int, int] = {}   # question index -> row of its translated vector
+    if DUAL_LANGUAGE_RETRIEVAL:
+        for index, question in enumerate(questions):
+            if detect_language(question) != "vi":
+                continue
+            translated = translate_query(question)
+            if translated is None:
+                continue
+            print(f"[DEBUG] Dual-language query: '{translated}'")
+            extra_rows[index] = len(vectors)
+            vectors.append(list(embed_translated_query(translated)))
+
+    results = query_contexts(vectors, top_k=top_k, corpus=corpus)
+    merged = []
+    for index in range(len(questions)):
+        if index in extra_rows:
+            merged.append(merge_contexts([results[index], results[extra_rows[index]]], top_k))
+        else:
+            merged.append(results[index])
+    return merged
+
+
+def retrieve_context(
+    question: str,
+    top_k: int = 5,
+    query_vector: Optional[List[float]] = None,
+    corpus: Optional[str] = None,
+) -> List[Dict]:
     """
     Retrieve the top_k most relevant chunks from the vector database.
     Returns a list of dictionaries containing:
+    - id
     - text
     - metadata
     - similarity score
+
+    Pass query_vector to reuse an embedding that was already computed, and
+    corpus to search a named corpus instead of the default one. Vietnamese
+    questions may also be searched in English (see query_contexts_for_questions).
     """
-    query_vector = embed_query(question)
+    if query_vector is None:
+        query_vector = embed_query(question)
 
     print("[DEBUG] Query vector dimension:", len(query_vector))
     print("[DEBUG] Retrieving top_k:", top_k)
 
-    results = collection.query(
-        query_embeddings=[query_vector],
-        n_results=top_k,
-        include=["documents", "metadatas", "distances"],
-    )
-
-    contexts = []
-    docs = results["documents"][0]
-    metas = results["metadatas"][0]
-    dists = results["distances"][0]
+    contexts = query_contexts_for_questions([question], [query_vector], top_k=top_k, corpus=corpus)[0]
 
     print("\n[DEBUG] Retrieved results:")
-    for doc, meta, dist in zip(docs, metas, dists):
-        print(f"- File: {meta.get('source_file')} | Score: {dist}")
-
-    # Aggregate matched chunks into a structured list
-    for doc, meta, dist in zip(docs, metas, dists):
-        contexts.append(
-            {
-                "text": doc,
-                "metadata": meta,
-                "score": dist,
-            }
-        )
+    for ctx in contexts:
+        print(f"- File: {ctx['metadata'].get('source_file')} | Score: {ctx['score']}")
 
     print("[DEBUG] Retrieved context length:", sum(len(c["text"]) for c in contexts))
     return contexts
@@ -111,9 +281,9 @@ def build_prompt(
     3. If the user asks in Vietnamese → answer in Vietnamese.
     4. If the answer cannot be found in context:
     - If the user asks in English → reply exactly:
-        "I could not find the exact information in the internal documentation."
+        "{NOT_FOUND_MESSAGES['en']}"
     - If the user asks in Vietnamese → reply exactly:
-        "Tôi không tìm thấy thông tin chính xác trong tài liệu nội bộ."
+        "{NOT_FOUND_MESSAGES['vi']}"
 
     CONVERSATION SO FAR:
     {history_text}
@@ -129,46 +299,92 @@ def build_prompt(
     return prompt
 
 
-def generate_answer(
+def answer_from_contexts(
     question: str,
-    top_k: int = 10,
+    contexts: List[Dict],
     history: Optional[List[Dict]] = None,
 ) -> Dict:
     """
-    Full RAG pipeline:
-    1. Retrieve relevant context.
-    2. Build the prompt (including optional chat history).
-    3. Generate an answer using Gemini.
+    Generate the answer for already-retrieved contexts.
+    Returns {"answer": ..., "sources": [...], "citations": [...], "chunk_ids": [...],
+    "confidence": ...}.
+
+    sources and citations only cover the chunks that support the answer (one
+    source per file); chunk_ids lists every chunk the answer was grounded on.
+    When the retrieval confidence gate rejects the contexts, the not-found
+    message in the question's language is returned without an LLM call
+    (and "gated" is True). Follow-up questions (non-empty `history`) are never
+    gated, because the question alone does not carry the topic.
     """
-    contexts = retrieve_context(question, top_k=top_k)
-    prompt = build_prompt(question, contexts, history=history)
+    decision = retrieval_confidence(question, contexts)
+    if RETRIEVAL_GATE_ENABLED:
+        # Follow-ups ("and for interns?") score low on their own but are
+        # answerable with the chat history, so only first questions are gated
+        decision["follow_up"] = bool(history)
+        log_gate_decision(question, decision)
+        if not decision["passed"] and not history:
+            print(f"[DEBUG] Retrieval gate: confidence {decision['confidence']} below threshold")
+            return {
+                "answer": NOT_FOUND_MESSAGES[detect_language(question)],
+                "sources": [],
+                "citations": [],
+                "chunk_ids": [],
+                "confidence": decision["confidence"],
+                "gated": True,
+            }
 
-    response = client.models.generate_content(
-        model=GEN_MODEL,
-        contents=prompt,
-    )
+    prompt = build_prompt(question, contexts, history=history)
 
-    answer_text = response.text
+    answer_text = get_llm_provider().generate(prompt, model=GEN_MODEL)
 
-    # Prepare the list of source metadata to return to the API
-    sources = []
-    for ctx in contexts:
-        meta = ctx["metadata"]
-        sources.append(
-            {
-                "title": meta.get("title"),
-                "section": meta.get("section"),
-                "source_file": meta.get("source_file"),
-            }
-        )
+    if any(message in answer_text for message in NOT_FOUND_MESSAGES.values()):
+        cited = {"citations": [], "sources": []}
+    else:
+        cited = cite_answer(answer_text, contexts, embed_sentences=embed_queries)
     print("[DEBUG] Generated answer:", answer_text)
-    print("[DEBUG] Sources used:", sources)
-    
+    print("[DEBUG] Sources used:", cited["sources"])
+
     return {
         "answer": answer_text,
-        "sources": sources,
+        "sources": cited["sources"],
+        "citations": cited["citations"],
+        "chunk_ids": [ctx["id"] for ctx in contexts],
+        "confidence": decision["confidence"],
     }
 
+
+def generate_answer(
+    question: str,
+    top_k: int = 10,
+    history: Optional[List[Dict]] = None,
+    use_faq: bool = True,
+    corpus: Optional[str] = None,
+) -> Dict:
+    """
+    Full RAG pipeline:
+    1. Embed the question and return the stored answer on a close FAQ match
+       (only for the first question of a chat, i.e. without history).
+    2. Retrieve relevant context.
+    3. Build the prompt (including optional chat history).
+    4. Generate an answer with the LLM provider (Gemini or the local stub).
+
+    Set use_faq=False to always run retrieval + generation (used when
+    building the FAQ index itself). `corpus` selects the named corpus
+    (default: DEFAULT_CORPUS).
+    """
+    query_vector = embed_query(question)
+
+    # FAQ answers are context-free: a follow-up in a conversation always goes
+    # through retrieval + generation with its history
+    if use_faq and not history:
+        faq_result = lookup_faq_answer(query_vector, corpus=corpus)
+        if faq_result is not None:
+            return faq_result
+
+    contexts = retrieve_context(question, top_k=top_k, query_vector=query_vector, corpus=corpus)
+    return answer_from_contexts(question, contexts, history=history)
+
+
 if __name__ == "__main__":
     sample_question = "What is the leave policy for employees?"
     result = generate_answer(sample_question)
@@ -0,0 +1,203 @@
+# retrieval_gate.py
+
+"""
+Retrieval confidence gate.
+
+Responsibilities:
+- Turn the Chroma distances of the retrieved chunks into a confidence score
+  (top cosine similarity plus a small bonus for question/context word overlap).
+- Decide whether a question is answerable from the handbook at all; below the
+  threshold, rag_core returns the fixed "not found" message without an LLM call.
+- Calibrate the threshold offline on the benchmark questions (in-domain), a
+  list of off-topic questions and a list of follow-up questions. Follow-ups
+  are not gated in chats with history (see rag_core.answer_from_contexts);
+  the calibration reports how many of them the gate would block on their own.
+
+Usage:
+    python retrieval_gate.py --questions tts_questions.json --min-recall 0.98
+"""
+
+import argparse
+import math
+import re
+from typing import Dict, List, Optional
+
+from config import DEFAULT_CORPUS, RETRIEVAL_LEXICAL_WEIGHT, RETRIEVAL_MIN_CONFIDENCE
+
+QUESTIONS_FILE = "tts_questions.json"
+
+# Number of top chunks whose words count for the lexical overlap
+LEXICAL_TOP_CHUNKS = 3
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "were", "what", "when", "where", "which",
+    "who", "why", "how", "does", "did", "can", "could", "should", "would", "will",
+    "with", "from", "about", "into", "this", "that", "these", "those", "there",
+    "have", "has", "had", "you", "your", "our", "their", "they", "them", "its",
+    "any", "all", "not", "but", "get", "use", "need", "tts",
+}
+
+# Questions the handbook cannot answer, used to calibrate the threshold
+OFF_TOPIC_QUESTIONS = [
+    "What is the capital of Australia?",
+    "Who won the football world cup in 2018?",
+    "Can you give me a recipe for chocolate cake?",
+    "What will the weather be like tomorrow?",
+    "How many moons does Jupiter have?",
+    "Recommend a good science fiction movie.",
+    "What is the price of bitcoin today?",
+    "How do I change a flat tire on my bike?",
+    "Write a poem about the ocean.",
+    "What is the best way to learn to play guitar?",
+    "Who painted the Mona Lisa?",
+    "How tall is Mount Everest?",
+    "Thủ đô của Úc là gì?",
+    "Cách nấu phở bò ngon nhất?",
+    "Giá vàng hôm nay bao nhiêu?",
+    "Đội nào vô địch World Cup 2018?",
+    "Thời tiết ngày mai ở Hà Nội thế nào?",
+    "Gợi ý cho tôi một bộ phim hay.",
+]
+
+# Follow-ups that only make sense after an earlier question; they score low on
+# their own, which is why the gate is skipped when a chat has history
+FOLLOW_UP_QUESTIONS = [
+    "What about part-time employees?",
+    "And how many days is that?",
+    "Does that also apply to interns?",
+    "Who do I need to ask for approval?",
+    "Can you explain the second step in more detail?",
+    "Is there a deadline for that?",
+    "Còn nhân viên bán thời gian thì sao?",
+    "Vậy là bao nhiêu ngày?",
+    "Ai duyệt cái đó?",
+]
+
+
+def distance_to_cosine(distance: float) -> float:
+    """
+    Cosine similarity from a Chroma l2 distance.
+
+    The E5 embeddings are normalized, and Chroma returns squared l2 distances,
+    so ||a - b||^2 = 2 - 2 cos(a, b).
+    """
+    return 1.0 - distance / 2.0
+
+
+def _content_words(text: str) -> set:
+    return {
+        word for word in (w.lower() for w in _WORD_RE.findall(text))
+        if len(word) >= 3 and word not in STOPWORDS
+    }
+
+
+def lexical_overlap(question: str, contexts: List[Dict]) -> float:
+    """Share of the question's content words that occur in the top chunks (0..1)."""
+    question_words = _content_words(question)
+    if not question_words:
+        return 0.0
+    context_words = set()
+    for ctx in contexts[:LEXICAL_TOP_CHUNKS]:
+        context_words |= _content_words(ctx["text"])
+    return len(question_words & context_words) / len(question_words)
+
+
+def retrieval_confidence(
+    question: str,
+    contexts: List[Dict],
+    threshold: float = RETRIEVAL_MIN_CONFIDENCE,
+    lexical_weight: float = RETRIEVAL_LEXICAL_WEIGHT,
+) -> Dict:
+    """
+    Score the retrieved `contexts` for `question` and apply the threshold.
+
+    Returns {"confidence", "top_similarity", "lexical_overlap", "threshold", "passed"}.
+    """
+    top_similarity = max((distance_to_cosine(ctx["score"]) for ctx in contexts), default=0.0)
+    overlap = lexical_overlap(question, contexts) if lexical_weight else 0.0
+    confidence = top_similarity + lexical_weight * overlap
+    return {
+        "confidence": round(confidence, 4),
+        "top_similarity": round(top_similarity, 4),
+        "lexical_overlap": round(overlap, 4),
+        "threshold": threshold,
+        "passed": confidence >= threshold,
+    }
+
+
+def choose_threshold(in_domain: List[float], min_recall: float) -> float:
+    """Highest threshold that still lets at least `min_recall` of the in-domain questions through."""
+    ranked = sorted(in_domain, reverse=True)
+    keep = max(1, math.ceil(min_recall * len(ranked)))
+    return ranked[min(keep, len(ranked)) - 1]
+
+
+def _confidences(questions: List[str], top_k: int, corpus: Optional[str]) -> List[float]:
+    from batch_qa import QUERY_BATCH_SIZE
+    from rag_core import embed_queries, query_contexts_for_questions
+
+    vectors = embed_queries(questions)
+    scores: List[float] = []
+    for start in range(0, len(questions), QUERY_BATCH_SIZE):
+        end = start + QUERY_BATCH_SIZE
+        all_contexts = query_contexts_for_questions(
+            questions[start:end], vectors[start:end], top_k=top_k, corpus=corpus
+        )
+        for question, contexts in zip(questions[start:end], all_contexts):
+            scores.append(retrieval_confidence(question, contexts)["confidence"])
+    return scores
+
+
+def main() -> None:
+    """Calibrate RETRIEVAL_MIN_CONFIDENCE (retrieval only, no LLM calls)."""
+    parser = argparse.ArgumentParser(description="Calibrate the retrieval confidence gate.")
+    parser.add_argument("--questions", default=QUESTIONS_FILE, help="In-domain questions (.json/.jsonl/.txt).")
+    parser.add_argument("--off-topic", help="Extra off-topic questions (.json/.jsonl/.txt).")
+    parser.add_argument("--follow-ups", help="Extra follow-up questions (.json/.jsonl/.txt).")
+    parser.add_argument("--min-recall", type=float, default=0.98,
+                        help="Share of in-domain questions that must pass the gate.")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+
+    from batch_qa import load_batch_questions
+
+    in_domain_questions = load_batch_questions(args.questions)
+    off_topic_questions = list(OFF_TOPIC_QUESTIONS)
+    if args.off_topic:
+        off_topic_questions.extend(load_batch_questions(args.off_topic))
+    follow_up_questions = list(FOLLOW_UP_QUESTIONS)
+    if args.follow_ups:
+        follow_up_questions.extend(load_batch_questions(args.follow_ups))
+
+    in_domain = _confidences(in_domain_questions, args.top_k, args.corpus)
+    off_topic = _confidences(off_topic_questions, args.top_k, args.corpus)
+    follow_ups = _confidences(follow_up_questions, args.top_k, args.corpus)
+
+    print(f"\n{len(in_domain)} in-domain, {len(off_topic)} off-topic, {len(follow_ups)} follow-up questions")
+    print(f"{'threshold':>10} {'in-domain pass':>15} {'off-topic blocked':>18} {'follow-up blocked':>18}")
+    candidates = sorted({round(x, 2) for x in in_domain + off_topic})
+    for threshold in candidates:
+        passed = sum(1 for c in in_domain if c >= threshold) / len(in_domain)
+        blocked = sum(1 for c in off_topic if c < threshold) / len(off_topic)
+        follow_up_blocked = sum(1 for c in follow_ups if c < threshold) / len(follow_ups)
+        print(f"{threshold:10.2f} {passed:15.1%} {blocked:18.1%} {follow_up_blocked:18.1%}")
+
+    recommended = choose_threshold(in_domain, args.min_recall)
+    blocked = sum(1 for c in off_topic if c < recommended) / len(off_topic)
+    follow_up_blocked = sum(1 for c in follow_ups if c < recommended) / len(follow_ups)
+    print(
+        f"\nRecommended: RETRIEVAL_MIN_CONFIDENCE={recommended:.4f} "
+        f"(>= {args.min_recall:.0%} in-domain pass, {blocked:.1%} off-topic blocked; "
+        f"current {RETRIEVAL_MIN_CONFIDENCE})"
+    )
+    print(
+        f"Follow-ups scored alone: {follow_up_blocked:.1%} would be blocked "
+        f"(the gate is skipped for questions asked with chat history)."
+    )
+
+
+if __name__ == "__main__":
+    main()
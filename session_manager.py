@@ -10,6 +10,7 @@ Responsibilities:
 - Store generated answers per session after background processing.
 """
 
+import os
 import time
 from typing import Dict, Optional
 import uuid
@@ -106,4 +107,5 @@ class SessionManager:
         return ans    
     
 # Create a shared instance for the entire app
-session_manager = SessionManager(compose_window=10.0)
+# COMPOSE_WINDOW_SECONDS can shorten the window, e.g. for load tests
+session_manager = SessionManager(compose_window=float(os.getenv("COMPOSE_WINDOW_SECONDS", "10")))
@@ -0,0 +1,311 @@
+# snapshot.py
+
+"""
+Pre-built, memory-mapped snapshots of corpus collections for a fast warm start.
+
+Responsibilities:
+- After ingest, export a collection version into a compact artifact:
+    snapshots/<collection_name>/
+        manifest.json   collection name and metadata, count, dimension, creation time
+        vectors.npy     float32 embedding matrix (row i = ids[i])
+        ids.json        row -> chunk id
+        chunks.jsonl    row -> {"document", "metadata"}
+- Open an artifact with np.load(mmap_mode="r") and serve the subset of the
+  Chroma collection API that the pipeline uses (query / get / count) with an
+  exact brute-force search, so the API does not have to open Chroma's SQLite
+  and HNSW files before answering.
+- Run a fixed set of warm-up queries and report their latency percentiles
+  (used by the API readiness probe).
+
+config.get_collection returns a SnapshotCollection when a snapshot of the
+active collection exists (SNAPSHOT_ENABLED=1). There is no lexical index in
+this tree, so none is exported.
+
+Usage:
+    python snapshot.py export --corpus handbook     # snapshot the active collection
+    python snapshot.py warm-up --corpus handbook    # print warm-up latency
+    python snapshot.py check-reingest --pages-dir pages   # ingest twice from a snapshot
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import DEFAULT_CORPUS, PAGES_DIR, SNAPSHOT_DIR, SNAPSHOT_ENABLED
+from metrics import summarize
+
+# Rows read from Chroma per get() call while exporting
+EXPORT_PAGE_SIZE = 5000
+
+WARM_UP_QUERIES = [
+    "What is the leave policy for employees?",
+    "How do I request overtime?",
+    "How does the hiring process work?",
+    "How do I set up my laptop on the first day?",
+    "What is the code of conduct?",
+    "How do I submit a travel reimbursement?",
+    "How do mid-year performance reviews work?",
+    "How do I install Slack?",
+    "Chính sách nghỉ phép cho nhân viên là gì?",
+    "Làm thế nào để đăng ký đi công tác?",
+]
+
+# Throwaway corpus built by check_reingest
+REINGEST_CHECK_CORPUS = "snapshot-check"
+
+_snapshots: Dict[str, "SnapshotCollection"] = {}
+_snapshots_lock = threading.Lock()
+
+
+def snapshot_path(collection_name: str) -> str:
+    """Directory of the snapshot of `collection_name`."""
+    return os.path.join(SNAPSHOT_DIR, collection_name)
+
+
+class SnapshotCollection:
+    """
+    Read-only, memory-mapped view of an exported collection.
+
+    Mirrors the parts of the Chroma collection API used by the pipeline.
+    Distances are squared l2, like Chroma's default space.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        self.name = self.manifest["collection"]
+        self.metadata = self.manifest.get("metadata") or {}
+        self._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as file:
+            self._ids: List[str] = json.load(file)
+        self._documents: List[str] = []
+        self._metadatas: List[dict] = []
+        with open(os.path.join(path, "chunks.jsonl"), "r", encoding="utf-8") as file:
+            for line in file:
+                chunk = json.loads(line)
+                self._documents.append(chunk["document"])
+                self._metadatas.append(chunk["metadata"])
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._sq_norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def _fields(self, rows: Sequence[int], include: Sequence[str]) -> Dict[str, list]:
+        result: Dict[str, list] = {"ids": [self._ids[r] for r in rows]}
+        result["documents"] = [self._documents[r] for r in rows] if "documents" in include else None
+        result["metadatas"] = [self._metadatas[r] for r in rows] if "metadatas" in include else None
+        result["embeddings"] = [self._vectors[r].tolist() for r in rows] if "embeddings" in include else None
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, include: Sequence[str] = ("documents", "metadatas")) -> Dict:
+        """Rows for `ids` (all rows if None); unknown ids are skipped, as in Chroma."""
+        if ids is None:
+            rows = list(range(len(self._ids)))
+        else:
+            rows = [self._rows[i] for i in ids if i in self._rows]
+        return self._fields(rows, include)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+    ) -> Dict:
+        """Exact top-n search; returns one list per query vector, closest first."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        distances = (
+            self._sq_norms[None, :]
+            - 2.0 * (queries @ self._vectors.T)
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+        n = min(n_results, len(self._ids))
+
+        result: Dict[str, list] = {"ids": [], "documents": [], "metadatas": [], "embeddings": [], "distances": []}
+        for row_distances in distances:
+            if n < len(self._ids):
+                top = np.argpartition(row_distances, max(n - 1, 0))[:n]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(row_distances[top])]
+            fields = self._fields(top.tolist(), include)
+            for key in ("ids", "documents", "metadatas", "embeddings"):
+                result[key].append(fields[key])
+            result["distances"].append(row_distances[top].tolist())
+
+        for key in ("documents", "metadatas", "embeddings", "distances"):
+            if key not in include:
+                result[key] = None
+        return result
+
+
+def load_snapshot(collection_name: str) -> Optional[SnapshotCollection]:
+    """Return the memory-mapped snapshot of `collection_name`, or None if it was never exported."""
+    snapshot = _snapshots.get(collection_name)
+    if snapshot is not None:
+        return snapshot
+
+    path = snapshot_path(collection_name)
+    if not os.path.exists(os.path.join(path, "manifest.json")):
+        return None
+    with _snapshots_lock:
+        snapshot = _snapshots.get(collection_name)
+        if snapshot is None:
+            started = time.perf_counter()
+            snapshot = SnapshotCollection(path)
+            _snapshots[collection_name] = snapshot
+            print(
+                f"[INFO] Opened snapshot '{collection_name}' ({snapshot.count()} chunks) "
+                f"in {time.perf_counter() - started:.2f}s."
+            )
+    return snapshot
+
+
+def export_snapshot(collection, force: bool = False) -> str:
+    """
+    Write the snapshot of a Chroma `collection` and return its directory.
+
+    Collection versions are immutable, so an existing snapshot is kept unless
+    `force` is set. The artifact is written to a temporary directory first
+    and renamed into place, so readers never see a partial snapshot.
+    """
+    path = snapshot_path(collection.name)
+    if os.path.exists(os.path.join(path, "manifest.json")) and not force:
+        return path
+
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[dict] = []
+    vectors: List[np.ndarray] = []
+    total = collection.count()
+    for offset in range(0, total, EXPORT_PAGE_SIZE):
+        page = collection.get(
+            include=["documents", "metadatas", "embeddings"], limit=EXPORT_PAGE_SIZE, offset=offset
+        )
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "vectors.npy"), matrix)
+    with open(os.path.join(tmp_path, "ids.json"), "w", encoding="utf-8") as file:
+        json.dump(ids, file)
+    with open(os.path.join(tmp_path, "chunks.jsonl"), "w", encoding="utf-8") as file:
+        for document, metadata in zip(documents, metadatas):
+            file.write(json.dumps({"document": document, "metadata": metadata}, ensure_ascii=False) + "\n")
+    with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "collection": collection.name,
+                "metadata": collection.metadata or {},
+                "count": len(ids),
+                "dim": int(matrix.shape[1]) if len(ids) else 0,
+                "created_at": datetime.utcnow().isoformat(),
+            },
+            file,
+            indent=2,
+        )
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"[INFO] Wrote snapshot of '{collection.name}' ({len(ids)} chunks) to {path}.")
+    return path
+
+
+def delete_snapshot(collection_name: str) -> None:
+    """Remove the snapshot of a deleted collection version."""
+    with _snapshots_lock:
+        _snapshots.pop(collection_name, None)
+    shutil.rmtree(snapshot_path(collection_name), ignore_errors=True)
+
+
+def run_warm_up_queries(queries: Sequence[str] = WARM_UP_QUERIES, corpus: Optional[str] = None) -> Dict[str, float]:
+    """
+    Embed and retrieve every warm-up query once (no LLM call).
+    Returns the latency summary (count / mean / p50 / p90 / p99 / max in ms).
+    """
+    from rag_core import embed_query, query_contexts_for_questions
+
+    samples = []
+    for question in queries:
+        started = time.perf_counter()
+        query_contexts_for_questions([question], [embed_query(question)], top_k=10, corpus=corpus)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def check_reingest(pages_dir: str = PAGES_DIR, corpus: str = REINGEST_CHECK_CORPUS) -> None:
+    """
+    Build a throwaway `corpus` from pages_dir twice with snapshots on.
+
+    The second build reads the embeddings of unchanged chunks from the
+    snapshot of the first one, so this fails if snapshot rows cannot be
+    written back into Chroma. All versions of `corpus` and its alias are
+    removed afterwards. Raises RuntimeError when the check fails.
+    """
+    from config import get_collection
+    from corpus_registry import corpus_exists, garbage_collect, remove_alias
+    from ingest_handbook import ingest_pages
+
+    if not SNAPSHOT_ENABLED:
+        raise RuntimeError("Set SNAPSHOT_ENABLED=1 to check re-ingestion from snapshots.")
+    if corpus_exists(corpus):
+        raise RuntimeError(f"Corpus '{corpus}' already exists; pick another name with --corpus.")
+
+    try:
+        first = ingest_pages(corpus=corpus, pages_dir=pages_dir, refresh_faq=False)
+        active = get_collection(corpus)
+        if not isinstance(active, SnapshotCollection):
+            raise RuntimeError(f"No snapshot was written for '{first}'.")
+        second = ingest_pages(corpus=corpus, pages_dir=pages_dir, refresh_faq=False)
+        if second == first or get_collection(corpus).count() != active.count():
+            raise RuntimeError(f"Rebuild '{second}' does not match '{first}'.")
+        print(f"[INFO] Re-ingestion from the snapshot of '{first}' succeeded ({active.count()} chunks).")
+    finally:
+        if corpus_exists(corpus):
+            remove_alias(corpus)
+        garbage_collect(corpus, keep=0)
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Export corpus snapshots and measure warm-up latency.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Snapshot the active collection of a corpus.")
+    export.add_argument("--corpus", default=DEFAULT_CORPUS)
+    export.add_argument("--force", action="store_true", help="Overwrite an existing snapshot.")
+    warm_up = subparsers.add_parser("warm-up", help="Run the warm-up queries and print their latency.")
+    warm_up.add_argument("--corpus", default=DEFAULT_CORPUS)
+    warm_up.add_argument("--rounds", type=int, default=3)
+    check = subparsers.add_parser("check-reingest", help="Ingest a throwaway corpus twice, reusing its snapshot.")
+    check.add_argument("--pages-dir", default=PAGES_DIR)
+    check.add_argument("--corpus", default=REINGEST_CHECK_CORPUS)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from config import get_chroma_client
+        from corpus_registry import resolve_collection_name
+
+        collection = get_chroma_client().get_collection(resolve_collection_name(args.corpus))
+        export_snapshot(collection, force=args.force)
+    elif args.command == "check-reingest":
+        check_reingest(pages_dir=args.pages_dir, corpus=args.corpus)
+    else:
+        for index in range(1, args.rounds + 1):
+            print(f"Round {index}: {run_warm_up_queries(corpus=args.corpus)}")
+
+
+if __name__ == "__main__":
+    main()
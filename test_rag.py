@@ -5,7 +5,8 @@ import time
 from typing import Tuple, List, Dict, Any
 
 from rag_core import generate_answer
-from config import client, JUDGE_MODEL
+from config import JUDGE_MODEL
+from llm_provider import get_llm_provider
 
 ATTEMPTS_PER_QUESTION = 3
 LOG_FILE = "rag_test_results_2.jsonl"  # JSONL safe append
@@ -119,12 +120,7 @@ NO | <reason>
 Do not add any other text, no bullet points, no quotes.
 """
 
-    response = client.models.generate_content(
-        model=JUDGE_MODEL,
-        contents=judge_prompt,
-    )
-
-    raw = response.text.strip()
+    raw = get_llm_provider().generate(judge_prompt, model=JUDGE_MODEL).strip()
 
     if "|" in raw:
         tag, reason = raw.split("|", 1)